@@ -1,9 +1,12 @@
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
 
 class AboutAuthorViewTests(TestCase):
     def setUp(self):
+        # Иначе страница отдаётся гостю из кэша, без рендеринга шаблона
+        cache.clear()
         self.guest_client = Client()
 
     def test_about_author_page_accessible_by_name(self):
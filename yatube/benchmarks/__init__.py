@@ -0,0 +1,14 @@
+"""Нагрузочные замеры страниц posts.urls на разных объёмах данных.
+
+Запуск из каталога yatube/:
+
+    python -m benchmarks --sizes 1000,100000 --output bench.json
+    python -m benchmarks --baseline bench.json --threshold 0.2
+
+Одновременные чтения и записи с настройками SQLite по умолчанию и из
+settings (WAL, PRAGMA, CONN_MAX_AGE):
+
+    python -m benchmarks.concurrency --readers 8 --writers 2 --duration 10
+
+Замеры идут на отдельной базе (как у тестов), рабочая база не трогается.
+"""
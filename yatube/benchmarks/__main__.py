@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import django
+
+DEFAULT_SIZES = '1000,100000,1000000'
+# Метрики, по которым ищется регрессия относительно базового прогона
+LATENCY_METRICS = ('p50_ms', 'p95_ms')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Замеры страниц posts.urls на разных объёмах данных')
+    parser.add_argument(
+        '--sizes', default=DEFAULT_SIZES,
+        help=f'Число постов через запятую (по умолчанию {DEFAULT_SIZES})')
+    parser.add_argument('--authors', type=int, default=50)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Сколько раз запрашивать каждый URL')
+    parser.add_argument('--output', '-o', default='-',
+                        help='Файл для JSON с результатами')
+    parser.add_argument('--baseline',
+                        help='JSON прошлого прогона для сравнения')
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help='Допустимый рост задержки относительно baseline (0.2 = 20%%)')
+    parser.add_argument(
+        '--database', default=os.path.join(tempfile.gettempdir(),
+                                           'yatube-benchmark.sqlite3'),
+        help='Файл базы для замеров; пересоздаётся при каждом запуске')
+    return parser.parse_args(argv)
+
+
+def find_regressions(results, baseline, threshold):
+    """Замеры, ставшие медленнее baseline больше чем на threshold или
+    сделавшие больше SQL-запросов."""
+    previous = {
+        (row['size'], row['url_name'], row['case']): row
+        for row in baseline['results']
+    }
+    regressions = []
+    for row in results:
+        old = previous.get((row['size'], row['url_name'], row['case']))
+        if old is None:
+            continue
+        name = f'{row["url_name"]} {row["case"]} @ {row["size"]}'
+        for metric in LATENCY_METRICS:
+            if row[metric] > old[metric] * (1 + threshold):
+                regressions.append(
+                    f'{name}: {metric} {old[metric]} -> {row[metric]}')
+        if row['queries'] > old['queries']:
+            regressions.append(
+                f'{name}: запросов {old["queries"]} -> {row["queries"]}')
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    django.setup()
+
+    from django.test.utils import setup_test_environment
+
+    from benchmarks.measure import run
+    from benchmarks.seed import create_database, seed
+
+    setup_test_environment()
+    create_database(args.database)
+
+    results = []
+    for size in sorted(int(size) for size in args.sizes.split(',')):
+        print(f'Заполнение базы до {size} постов...', file=sys.stderr)
+        seed(size, authors=args.authors, groups=args.groups)
+        print(f'Замеры на {size} постах...', file=sys.stderr)
+        results.extend(run(size, repeat=args.repeat))
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for line in regressions:
+            print(f'РЕГРЕССИЯ {line}', file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import django
+
+# Настройки Django и SQLite по умолчанию: журнал DELETE, транзакции
+# DEFERRED, новое соединение на каждый запрос
+DEFAULTS = {
+    'pragmas': {'journal_mode': 'delete', 'synchronous': 'full'},
+    'transaction_mode': 'DEFERRED',
+    'conn_max_age': 0,
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.concurrency',
+        description='Пропускная способность при одновременных чтениях и '
+                    'записях: SQLite по умолчанию и с настройками из '
+                    'settings')
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--authors', type=int, default=20)
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--readers', type=int, default=8,
+                        help='Потоков, читающих ленты и посты')
+    parser.add_argument('--writers', type=int, default=2,
+                        help='Потоков, создающих и правящих посты')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='Секунд на каждый вариант настроек')
+    parser.add_argument('--output', '-o', default='-',
+                        help='Файл для JSON с результатами')
+    parser.add_argument(
+        '--database', default=os.path.join(tempfile.gettempdir(),
+                                           'yatube-concurrency.sqlite3'),
+        help='Файл базы для замеров; пересоздаётся при каждом запуске')
+    return parser.parse_args(argv)
+
+
+class Worker(threading.Thread):
+    """Поток, повторяющий запросы одного клиента до истечения времени.
+
+    Тестовый клиент не закрывает соединения с базой, поэтому после
+    каждого запроса вызывается close_old_connections - как это делает
+    обработчик запросов веб-сервера с учётом CONN_MAX_AGE.
+    """
+
+    def __init__(self, client, send, deadline):
+        super().__init__(daemon=True)
+        self.client = client
+        self.send = send
+        self.deadline = deadline
+        self.timings = []
+        self.errors = 0
+
+    def run(self):
+        from django.db import OperationalError, close_old_connections
+        from django.db import connections
+
+        while time.perf_counter() < self.deadline:
+            started = time.perf_counter()
+            try:
+                ok = self.send(self.client).status_code < 500
+            except OperationalError:
+                # "database is locked"
+                ok = False
+            finally:
+                close_old_connections()
+            if ok:
+                self.timings.append((time.perf_counter() - started) * 1000)
+            else:
+                self.errors += 1
+        connections.close_all()
+
+
+def summary(workers, duration):
+    from benchmarks.measure import percentile
+
+    timings = [value for worker in workers for value in worker.timings]
+    return {
+        'requests': len(timings),
+        'per_second': round(len(timings) / duration, 1),
+        'p50_ms': round(percentile(timings, 0.5), 3) if timings else None,
+        'p95_ms': round(percentile(timings, 0.95), 3) if timings else None,
+        'errors': sum(worker.errors for worker in workers),
+    }
+
+
+def run(name, config, clients, duration):
+    """Один прогон читателей и писателей с настройками config."""
+    from django.db import connections
+    from django.test import override_settings
+
+    readers, writers = clients
+    connections.close_all()
+    connections.databases['default']['CONN_MAX_AGE'] = config['conn_max_age']
+    with override_settings(SQLITE_PRAGMAS=config['pragmas'],
+                           SQLITE_TRANSACTION_MODE=config['transaction_mode']):
+        deadline = time.perf_counter() + duration
+        reading = [Worker(client, send, deadline) for client, send in readers]
+        writing = [Worker(client, send, deadline) for client, send in writers]
+        for worker in reading + writing:
+            worker.start()
+        for worker in reading + writing:
+            worker.join()
+    return {
+        'config': name,
+        'reads': summary(reading, duration),
+        'writes': summary(writing, duration),
+    }
+
+
+def make_clients(readers, writers):
+    """Авторизованные клиенты (им не отдаются страницы из кэша) и их
+    запросы: читатели открывают ленты и посты, писатели создают посты и
+    правят свои."""
+    from django.test import Client
+    from django.urls import reverse
+
+    from posts.models import Group, Post, User
+
+    authors = list(User.objects.filter(username__startswith='bench-'))
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+
+    def read(client):
+        url = random.choice([
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[random.choice(slugs)]),
+            reverse('posts:profile', args=[random.choice(authors)]),
+            reverse('posts:post_detail', args=[random.choice(post_ids)]),
+        ])
+        return client.get(url)
+
+    def writer(author):
+        own = list(Post.objects.filter(author=author).values_list(
+            'pk', flat=True)[:100])
+        group = Group.objects.first()
+
+        def write(client):
+            if random.random() < 0.5:
+                return client.post(reverse('posts:post_create'), {
+                    'text': 'Пост из замера', 'group': group.pk})
+            return client.post(
+                reverse('posts:post_edit', args=[random.choice(own)]),
+                {'text': f'Правка {random.random()}', 'group': group.pk})
+        return write
+
+    def login(user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    return (
+        [(login(authors[i % len(authors)]), read) for i in range(readers)],
+        [(login(author), writer(author))
+         for author in (authors[i % len(authors)] for i in range(writers))],
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    django.setup()
+
+    from django.conf import settings
+    from django.test.utils import setup_test_environment
+
+    from benchmarks.seed import create_database, seed
+
+    setup_test_environment()
+    tuned = {
+        'pragmas': settings.SQLITE_PRAGMAS,
+        'transaction_mode': settings.SQLITE_TRANSACTION_MODE,
+        'conn_max_age': settings.DATABASES['default']['CONN_MAX_AGE'],
+    }
+    create_database(args.database)
+    print(f'Заполнение базы до {args.posts} постов...', file=sys.stderr)
+    seed(args.posts, authors=args.authors, groups=args.groups)
+    clients = make_clients(args.readers, args.writers)
+
+    results = []
+    for name, config in (('defaults', DEFAULTS), ('tuned', tuned)):
+        print(f'Замер: {name}...', file=sys.stderr)
+        results.append(run(name, config, clients, args.duration))
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'readers': args.readers,
+            'writers': args.writers,
+            'duration': args.duration,
+            'configs': {'defaults': DEFAULTS, 'tuned': tuned},
+        },
+        'results': results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from core.query_budget import QueryCollector
+from posts.models import Group, Post, User
+from posts.paginators import CursorPaginator, encode_cursor
+from posts.views import feed_posts
+
+PER_PAGE = 10
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, round(fraction * (len(values) - 1)))
+    return values[index]
+
+
+@contextmanager
+def rolled_back(rollback):
+    """Транзакция, откатываемая в конце, если rollback.
+
+    Так POST-замеры не меняют данные: каждое повторение создаёт или
+    правит пост в той же базе, что и первое, а следующие GET-замеры и
+    размеры видят только посты из seed. BEGIN и ROLLBACK не входят в
+    замер, а atomic() внутри view становятся точками сохранения.
+    """
+    if not rollback:
+        yield
+        return
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(client, method, path, data=None, repeat=20, warmup=2):
+    """Задержки (мс), число запросов и размер ответа для одного URL."""
+    send = client.post if method == 'POST' else client.get
+    writes = method == 'POST'
+    for _ in range(warmup):
+        with rolled_back(writes):
+            send(path, data)
+    timings = []
+    for _ in range(repeat):
+        collector = QueryCollector()
+        with rolled_back(writes):
+            started = time.perf_counter()
+            with collector.capture():
+                response = send(path, data)
+            timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'status': response.status_code,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'queries': len(collector),
+        'bytes': len(response.content),
+    }
+
+
+def feed_cases(url_name, args, post_list):
+    """Первая, средняя и последняя страницы ленты - курсорами и номерами."""
+    url = reverse(url_name, args=args)
+    total = post_list.count()
+    last_page = max(1, -(-total // PER_PAGE))
+    middle_page = max(1, last_page // 2)
+    ordered = CursorPaginator(post_list, PER_PAGE).object_list
+    yield 'first', url
+    for case, page in (('middle', middle_page), ('last', last_page)):
+        yield f'{case}_page', f'{url}?page={page}'
+        offset = (page - 1) * PER_PAGE - 1
+        if offset >= 0:
+            cursor = encode_cursor(ordered[offset])
+            yield f'{case}_cursor', f'{url}?after={cursor}'
+
+
+def cases():
+    """(имя URL, вариант, метод, путь, данные формы) для всех posts.urls."""
+    group = Group.objects.filter(slug__startswith='bench-').first()
+    author = User.objects.filter(username__startswith='bench-').first()
+    post = Post.objects.filter(author=author).first()
+    feeds = (
+        ('posts:index', [], feed_posts()),
+        ('posts:group_list', [group.slug], feed_posts(group=group)),
+        ('posts:profile', [author.username], feed_posts(author=author)),
+    )
+    for url_name, args, post_list in feeds:
+        for case, path in feed_cases(url_name, args, post_list):
+            yield url_name, case, 'GET', path, None
+    yield ('posts:post_detail', 'get', 'GET',
+           reverse('posts:post_detail', args=[post.pk]), None)
+    yield ('posts:post_edit', 'get', 'GET',
+           reverse('posts:post_edit', args=[post.pk]), None)
+    yield ('posts:post_edit', 'post', 'POST',
+           reverse('posts:post_edit', args=[post.pk]),
+           {'text': post.text, 'group': group.pk})
+    yield ('posts:post_create', 'get', 'GET',
+           reverse('posts:post_create'), None)
+    yield ('posts:post_create', 'post', 'POST',
+           reverse('posts:post_create'),
+           {'text': 'Пост из замера', 'group': group.pk})
+
+
+def run(size, repeat=20):
+    """Замеры всех URL на текущих данных.
+
+    Запросы идут от имени автора: авторизованным не отдаются закэшированные
+    страницы, и каждый замер проходит весь путь view и шаблона.
+    """
+    author = User.objects.filter(username__startswith='bench-').first()
+    client = Client()
+    client.force_login(author)
+    results = []
+    for url_name, case, method, path, data in cases():
+        result = measure(client, method, path, data, repeat=repeat)
+        result.update(size=size, url_name=url_name, case=case, path=path)
+        results.append(result)
+    return results
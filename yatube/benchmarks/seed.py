@@ -0,0 +1,89 @@
+import itertools
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from django.db import connection
+from faker import Faker
+from mixer.backend.django import mixer
+
+from posts.management.commands.import_posts import create_posts
+from posts.models import AuthorStats, Group, GroupStats, Post, User
+from posts.rendering import RENDERER_VERSION, render_text
+from posts.search import rebuild_index
+
+BATCH_SIZE = 5000
+# Тексты постов берутся по кругу из небольшого набора: Faker слишком
+# медленный, чтобы генерировать миллион абзацев.
+TEXT_POOL_SIZE = 500
+# Дата поста номер n - SEED_START + n минут: база, дополненная до
+# следующего размера, продолжает даты прежних постов, а не повторяет их
+SEED_START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def create_database(path):
+    """Пересоздаёт базу для замеров в файле path.
+
+    Вместе с файлом удаляются журналы WAL прошлого прогона: оставшись
+    рядом с новой базой, они испортили бы её.
+    """
+    for name in (path, f'{path}-wal', f'{path}-shm'):
+        if os.path.exists(name):
+            os.remove(name)
+    connection.settings_dict['TEST']['NAME'] = path
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+def seed_users(count):
+    """Авторы с уникальными username; пароль у всех - 'benchmark'."""
+    existing = User.objects.filter(username__startswith='bench-').count()
+    for i in range(existing, count):
+        user = mixer.blend(User, username=f'bench-{i}')
+        user.set_password('benchmark')
+        user.save()
+    return list(User.objects.filter(
+        username__startswith='bench-').values_list('pk', flat=True))
+
+
+def seed_groups(count):
+    existing = Group.objects.filter(slug__startswith='bench-').count()
+    for i in range(existing, count):
+        mixer.blend(Group, slug=f'bench-{i}')
+    return list(Group.objects.filter(
+        slug__startswith='bench-').values_list('pk', flat=True))
+
+
+def seed_posts(total, authors, groups, seed=0):
+    """Догоняет число постов до total; даты идут по минуте от
+    SEED_START, примерно каждый пятый пост без группы."""
+    existing = Post.objects.count()
+    if existing >= total:
+        return
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    rng = random.Random(seed + existing)
+    pool = [fake.paragraph(nb_sentences=4) for _ in range(TEXT_POOL_SIZE)]
+    texts = itertools.cycle(pool)
+    # bulk_create минует Post.save(): HTML отрисовывается здесь, по разу
+    # на текст из набора
+    rendered = {text: render_text(text) for text in pool}
+    for offset in range(existing, total, BATCH_SIZE):
+        create_posts([
+            Post(
+                text=text,
+                text_html=rendered[text],
+                text_html_version=RENDERER_VERSION,
+                author_id=rng.choice(authors),
+                group_id=rng.choice(groups) if rng.random() > 0.2 else None,
+                pub_date=SEED_START + timedelta(minutes=number),
+            )
+            for number, text in zip(
+                range(offset, min(offset + BATCH_SIZE, total)), texts)
+        ])
+    AuthorStats.rebuild()
+    GroupStats.rebuild()
+    rebuild_index()
+
+
+def seed(total, authors=50, groups=20):
+    seed_posts(total, seed_users(authors), seed_groups(groups))
@@ -0,0 +1,25 @@
+from django.contrib import admin
+
+from .models import SlowQuery
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Журнал только для просмотра: записи добавляет core.slow_queries."""
+    list_display = ('created', 'duration', 'view', 'short_sql')
+    list_filter = ('view',)
+    search_fields = ('sql', 'path')
+    readonly_fields = ('created', 'duration', 'view', 'path', 'sql',
+                       'params', 'plan', 'stack')
+
+    def short_sql(self, obj):
+        return obj.sql[:100]
+    short_sql.short_description = 'SQL'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(SlowQuery, SlowQueryAdmin)
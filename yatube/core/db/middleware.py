@@ -0,0 +1,23 @@
+from .sqlite3.base import deferred
+
+# Методы, которые по HTTP не меняют данных
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class DeferredReadsMiddleware:
+    """Транзакции GET-запросов начинаются с BEGIN DEFERRED.
+
+    atomic() бывает и в запросах, которые только читают (формы админки
+    открываются в транзакции): с IMMEDIATE они ждали бы пишущих и
+    задерживали их. Стоит после SessionMiddleware - сохранение сессии
+    пишет в базу и остаётся IMMEDIATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in SAFE_METHODS:
+            return self.get_response(request)
+        with deferred():
+            return self.get_response(request)
@@ -0,0 +1,55 @@
+"""SQLite, настроенный для одновременных чтений и записей.
+
+При открытии соединения выполняются PRAGMA из SQLITE_PRAGMAS, а
+транзакции (atomic) основной базы начинаются с BEGIN
+SQLITE_TRANSACTION_MODE. Реплики только читают, поэтому их транзакции,
+как и блоки внутри deferred(), начинаются с BEGIN DEFERRED и не ждут
+чужих записей.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.sqlite3 import base
+
+
+@contextmanager
+def deferred(using=None):
+    """Транзакции блока не берут блокировку записи в начале.
+
+    Для atomic(), который только читает: с IMMEDIATE он ждал бы всех
+    пишущих и сам задерживал их. GET-запросы выполняются в нём целиком
+    (core.db.middleware.DeferredReadsMiddleware).
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    # У соединений других движков атрибута нет, и он ни на что не влияет
+    previous = getattr(connection, 'deferred', False)
+    connection.deferred = True
+    try:
+        yield
+    finally:
+        connection.deferred = previous
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deferred = False
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def transaction_mode(self):
+        if self.deferred or self.alias != DEFAULT_DB_ALIAS:
+            return 'DEFERRED'
+        return settings.SQLITE_TRANSACTION_MODE
+
+    def _start_transaction_under_autocommit(self):
+        # С IMMEDIATE блокировка записи берётся в начале транзакции. При
+        # DEFERRED транзакция, начавшаяся с чтения, не может дождаться
+        # записи: SQLite сразу отвечает "database is locked", не глядя
+        # на busy_timeout.
+        self.cursor().execute(f'BEGIN {self.transaction_mode()}')
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Нет записи в кэше (None - тоже значение: "объекта нет в базе")
+MISSING = object()
+
+
+class LRUCache:
+    """Кэш в памяти процесса: не больше maxsize записей, каждая живёт
+    ttl секунд; при переполнении вытесняется давно не читавшаяся.
+
+    Запись можно привязать к версии (например, версии ленты из общего
+    кэша): если при чтении версия другая, запись считается устаревшей.
+    Так изменения, сделанные другими процессами, видны раньше ttl.
+
+    Значения отдаются всем потокам одни и те же, поэтому менять их
+    нельзя.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version=None):
+        """Значение по ключу или MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is None or entry[0] <= time.monotonic()
+                    or entry[1] != version):
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
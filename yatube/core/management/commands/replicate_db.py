@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.replicas import replicate
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики DATABASE_REPLICAS - '
+            'замена репликации для локального запуска')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять копирование каждые столько секунд')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены (YATUBE_DB_REPLICAS)')
+        if any(connections[alias].vendor != 'sqlite'
+               for alias in ['default', *settings.DATABASE_REPLICAS]):
+            raise CommandError('Копирование поддерживается только для SQLite')
+        while True:
+            started = time.monotonic()
+            replicate()
+            self.stdout.write(
+                f'Реплики обновлены за {time.monotonic() - started:.2f} с: '
+                f'{", ".join(settings.DATABASE_REPLICAS)}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,362 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .query_budget import QueryCollector
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Файл METRICS_DIR с суммой значений завершившихся процессов
+AGGREGATE_FILE = 'aggregate.json'
+LOCK_FILE = '.lock'
+# Метка view для запросов, не совпавших ни с одним URL: сами пути в метки
+# не попадают, иначе число рядов растёт без ограничений
+UNMATCHED_VIEW = '<unmatched>'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def escape(value):
+    return (value.replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Registry:
+    """Метрики процесса и их объединение с другими процессами.
+
+    Без METRICS_DIR считаются только метрики текущего процесса. С ним
+    каждый процесс (воркер gunicorn) раз в METRICS_FLUSH_INTERVAL секунд
+    сбрасывает свои значения в файл <pid>.json этого каталога из
+    фонового потока, а /metrics суммирует файлы всех процессов.
+
+    Чтобы счётчики не уменьшались, при запуске процесс переносит файлы
+    завершившихся процессов (и прежний файл со своим pid, если pid
+    достался повторно) в общий aggregate.json и удаляет их.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.started_pid = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(labels), value]
+                       for labels, value in metric.values.items()]
+                for name, metric in self.metrics.items()
+            }
+
+    def directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def start(self):
+        """Запускает сброс метрик в METRICS_DIR для текущего процесса.
+
+        Вызывается на каждом запросе, но работает один раз на процесс -
+        в том числе в воркерах, созданных fork после импорта модуля.
+        """
+        directory = self.directory()
+        pid = os.getpid()
+        if not directory or self.started_pid == pid:
+            return
+        with self.lock:
+            if self.started_pid == pid:
+                return
+            self.started_pid = pid
+        self.fold_finished(directory)
+        threading.Thread(target=self.flush_periodically, daemon=True,
+                         name='metrics-flush').start()
+
+    def flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError as error:
+                logger.warning('Метрики не сброшены в файл: %s', error)
+
+    def flush(self):
+        directory = self.directory()
+        if not directory:
+            return
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        write_atomic(path, self.snapshot())
+
+    def fold_finished(self, directory):
+        """Переносит файлы завершившихся процессов в AGGREGATE_FILE."""
+        aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+        with open(os.path.join(directory, LOCK_FILE), 'w') as lock:
+            # Два процесса, запущенные одновременно, не перенесут один
+            # файл дважды
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            finished = [path for path in process_files(directory)
+                        if not is_running(process_id(path))]
+            if not finished:
+                return
+            merged = {}
+            for path in [aggregate_path, *finished]:
+                self.merge_file(merged, path)
+            write_atomic(aggregate_path, {
+                name: [[list(labels), value]
+                       for labels, value in values.items()]
+                for name, values in merged.items()
+            })
+            for path in finished:
+                os.remove(path)
+
+    def collect(self):
+        """Значения всех процессов: свои - из памяти, чужие - из файлов."""
+        merged = {
+            name: {tuple(labels): value for labels, value in values}
+            for name, values in self.snapshot().items()
+        }
+        directory = self.directory()
+        if not directory:
+            return merged
+        own = os.path.join(directory, f'{os.getpid()}.json')
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            if path != own:
+                self.merge_file(merged, path)
+        return merged
+
+    def merge_file(self, merged, path):
+        """Добавляет к merged значения из файла другого процесса."""
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            return
+        for name, values in snapshot.items():
+            metric = self.metrics.get(name)
+            if metric is None:
+                continue
+            merged.setdefault(name, {})
+            for labels, value in values:
+                labels = tuple(labels)
+                merged[name][labels] = metric.merge(
+                    merged[name].get(labels), value)
+
+    def expose(self):
+        """Все метрики в текстовом формате Prometheus."""
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for labels, value in sorted(collected[name].items()):
+                lines.extend(metric.samples(labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+def write_atomic(path, data):
+    """Пишет JSON через временный файл: читатель не увидит файл
+    записанным наполовину."""
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def process_files(directory):
+    """Файлы <pid>.json процессов (без AGGREGATE_FILE)."""
+    return [path for path in glob.glob(os.path.join(directory, '*.json'))
+            if process_id(path) is not None]
+
+
+def process_id(path):
+    name = os.path.basename(path)[:-len('.json')]
+    return int(name) if name.isdigit() else None
+
+
+def is_running(pid):
+    """Жив ли процесс pid. Файл со своим pid остался от прежнего
+    процесса, получившего тот же pid, - его тоже нужно перенести."""
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self.values = {}
+        registry.register(self)
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def merge(self, value, other):
+        return (value or 0) + other
+
+    def samples(self, labels, value):
+        yield (f'{self.name}{format_labels(self.labelnames, labels)} '
+               f'{format_value(value)}')
+
+
+class Histogram(Metric):
+    """Гистограмма: число наблюдений в каждом интервале, сумма и счётчик.
+
+    Значение хранится списком [n_1, ..., n_k, n_inf, sum]; накопленные
+    значения бакетов считаются только при выводе.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, amount, **labels):
+        key = self.key(labels)
+        index = bisect_left(self.buckets, amount)
+        with self.registry.lock:
+            value = self.values.get(key)
+            if value is None:
+                value = self.values[key] = [0] * (len(self.buckets) + 2)
+            value[index] += 1
+            value[-1] += amount
+
+    def merge(self, value, other):
+        if value is None:
+            return list(other)
+        return [a + b for a, b in zip(value, other)]
+
+    def samples(self, labels, value):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), value):
+            cumulative += count
+            bucket_labels = format_labels(
+                self.labelnames, labels, [('le', format_value(bound))])
+            yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+        labels = format_labels(self.labelnames, labels)
+        yield f'{self.name}_sum{labels} {format_value(value[-1])}'
+        yield f'{self.name}_count{labels} {cumulative}'
+
+
+REQUESTS = Counter(
+    'yatube_http_requests_total', 'Число обработанных запросов',
+    ('view', 'method', 'status'))
+LATENCY = Histogram(
+    'yatube_http_request_duration_seconds', 'Время обработки запроса',
+    ('view',))
+QUERIES = Histogram(
+    'yatube_http_request_db_queries', 'Число SQL-запросов на запрос',
+    ('view',), buckets=QUERY_BUCKETS)
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests_total',
+    'Обращения к кэшам по результату (hit, stale, miss)',
+    ('view', 'cache', 'result'))
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else UNMATCHED_VIEW
+
+
+def count_cache(request, cache_name, hit, stale=False):
+    """Отмечает попадание или промах кэша для view этого запроса;
+    stale - отдана устаревшая копия (result="stale")."""
+    result = 'stale' if stale else 'hit' if hit else 'miss'
+    CACHE_REQUESTS.inc(view=view_name(request), cache=cache_name,
+                       result=result)
+
+
+def cache_totals(cache_name):
+    """Обращения к кэшу cache_name по результатам, сумма по всем view.
+    Другие процессы учитываются, только если задан METRICS_DIR."""
+    totals = {}
+    collected = REGISTRY.collect()[CACHE_REQUESTS.name]
+    for (view, name, result), value in collected.items():
+        if name == cache_name:
+            totals[result] = totals.get(result, 0) + value
+    return totals
+
+
+class MetricsMiddleware:
+    """Задержка, статусы и число SQL-запросов по имени URL."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        started = time.perf_counter()
+        with collector.capture():
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        view = view_name(request)
+        REQUESTS.inc(view=view, method=request.method,
+                     status=response.status_code)
+        LATENCY.observe(elapsed, view=view)
+        QUERIES.observe(len(collector), view=view)
+        REGISTRY.start()
+        return response
+
+
+def metrics_view(request):
+    """Метрики для Prometheus: адресам METRICS_ALLOWED_IPS и
+    сотрудникам."""
+    allowed = (request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+               or request.user.is_staff)
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.expose(), content_type=CONTENT_TYPE)
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+                ('duration', models.FloatField(verbose_name='Длительность, мс')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params', models.TextField(blank=True, verbose_name='Параметры')),
+                ('plan', models.TextField(blank=True, verbose_name='План запроса')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='View')),
+                ('path', models.CharField(blank=True, max_length=2000, verbose_name='Адрес')),
+                ('stack', models.TextField(blank=True, verbose_name='Стек вызовов')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ('-pk',),
+            },
+        ),
+    ]
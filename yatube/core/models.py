@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """Запрос, выполнявшийся дольше SLOW_QUERY_THRESHOLD_MS.
+
+    Хранятся последние SLOW_QUERY_LOG_SIZE записей, более старые
+    удаляются при добавлении новых (core.slow_queries).
+    """
+    created = models.DateTimeField('Время', auto_now_add=True)
+    duration = models.FloatField('Длительность, мс')
+    sql = models.TextField('SQL')
+    params = models.TextField('Параметры', blank=True)
+    plan = models.TextField('План запроса', blank=True)
+    view = models.CharField('View', max_length=200, blank=True)
+    path = models.CharField('Адрес', max_length=2000, blank=True)
+    stack = models.TextField('Стек вызовов', blank=True)
+
+    class Meta:
+        ordering = ('-pk',)
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+    def __str__(self):
+        return f'{self.duration:.0f} мс: {self.sql[:50]}'
@@ -0,0 +1,162 @@
+import json
+import logging
+import random
+import threading
+from collections import defaultdict
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.template.base import Template
+
+from .query_budget import TRANSACTION_SQL, capture_queries
+
+logger = logging.getLogger(__name__)
+
+# Профиль запроса, который сейчас обрабатывается в этом потоке
+current_profile = ContextVar('current_profile', default=None)
+
+
+class RequestProfile:
+    """Время в базе, шаблонах и всего для одного запроса.
+
+    Время шаблонов считается без SQL-запросов, выполненных при их
+    отрисовке (ленивые queryset в шаблоне) - они попадают в db, так что
+    db + tpl + app = total.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.total = None
+        self.db_time = 0.0
+        self.queries = 0
+        self.template_time = 0.0
+        self.templates = defaultdict(float)
+        self.depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - started
+            if not sql.startswith(TRANSACTION_SQL):
+                self.queries += 1
+
+    def add_template(self, name, elapsed):
+        """Учитывает отрисовку шаблона; вложенные include входят и в
+        собственное время, и во время включившего их шаблона."""
+        self.templates[name] += elapsed
+        if not self.depth:
+            self.template_time += elapsed
+
+    def finish(self):
+        self.total = perf_counter() - self.started
+
+    def server_timing(self):
+        metrics = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+        ]
+        for name, metric in settings.PROFILING_TEMPLATE_METRICS.items():
+            if name in self.templates:
+                metrics.append(
+                    f'{metric};dur={self.templates[name] * 1000:.1f}')
+        app_time = self.total - self.db_time - self.template_time
+        metrics.append(f'app;dur={app_time * 1000:.1f}')
+        metrics.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total * 1000, 3),
+            'db_ms': round(self.db_time * 1000, 3),
+            'queries': self.queries,
+            'template_ms': round(self.template_time * 1000, 3),
+            'templates': {name: round(elapsed * 1000, 3)
+                          for name, elapsed in self.templates.items()},
+        }
+
+
+original_render = Template.render
+
+
+def profiled_render(self, context):
+    profile = current_profile.get()
+    if profile is None:
+        return original_render(self, context)
+    db_time = profile.db_time
+    started = perf_counter()
+    profile.depth += 1
+    try:
+        return original_render(self, context)
+    finally:
+        profile.depth -= 1
+        elapsed = perf_counter() - started - (profile.db_time - db_time)
+        profile.add_template(self.name or '<string>', elapsed)
+
+
+class TemplateInstrumentation:
+    """Подменяет Template.render на profiled_render, пока идёт хотя бы
+    один профилируемый запрос: через него рисуются и страницы, и каждый
+    {% include %}. Запросы других потоков в это время проходят через
+    обёртку без профиля - она сразу вызывает исходный метод.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+
+    def __enter__(self):
+        with self.lock:
+            if not self.active:
+                Template.render = profiled_render
+            self.active += 1
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.active -= 1
+            if not self.active:
+                Template.render = original_render
+
+
+instrumented_templates = TemplateInstrumentation()
+
+
+class ProfilingMiddleware:
+    """Профилирует долю запросов (PROFILING_SAMPLE_RATE).
+
+    Результат пишется в лог core.profiling строкой JSON с именем view из
+    resolver_match и отдаётся заголовком Server-Timing - сотрудникам или
+    всем при PROFILING_SERVER_TIMING_PUBLIC. Непопавшие в выборку
+    запросы обрабатываются без обёрток: Template.render подменяется
+    только на время профилируемых запросов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        try:
+            with capture_queries(profile), instrumented_templates:
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        profile.finish()
+        user = getattr(request, 'user', None)
+        if settings.PROFILING_SERVER_TIMING_PUBLIC or (
+                user is not None and user.is_staff):
+            response['Server-Timing'] = profile.server_timing()
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **profile.as_dict(),
+        }, ensure_ascii=False))
+        return response
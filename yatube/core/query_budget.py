@@ -0,0 +1,94 @@
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Сколько одинаковых (с точностью до параметров) запросов считать N+1.
+DUPLICATE_THRESHOLD = 3
+
+PLACEHOLDERS_RE = re.compile(r'%s(\s*,\s*%s)+')
+# Управление транзакцией - не запросы к данным; в тестах каждый
+# atomic() ещё и превращается в SAVEPOINT, искажая счёт.
+TRANSACTION_SQL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def capture_queries(wrapper):
+    """Подключает execute_wrapper ко всем базам; возвращает контекстный
+    менеджер, который отключает его."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+    return stack
+
+
+def normalize_sql(sql):
+    """Приводит запрос к шаблону: IN (%s, %s, %s) -> IN (%s...)."""
+    return PLACEHOLDERS_RE.sub('%s...', sql)
+
+
+class QueryCollector:
+    """Собирает запросы ко всем базам через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(TRANSACTION_SQL):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def capture(self):
+        return capture_queries(self)
+
+    def duplicates(self, threshold=DUPLICATE_THRESHOLD):
+        """Запросы, повторённые threshold и более раз с разными
+        параметрами - типичный признак N+1."""
+        counts = Counter(normalize_sql(sql) for sql in self.queries)
+        return {sql: n for sql, n in counts.items() if n >= threshold}
+
+
+def check_budget(name, collector, max_queries):
+    problems = []
+    if len(collector) > max_queries:
+        problems.append(
+            f'{name}: {len(collector)} запросов при бюджете {max_queries}')
+    for sql, count in collector.duplicates().items():
+        problems.append(f'{name}: N+1, запрос выполнен {count} раз: {sql}')
+    if not problems:
+        return
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded('\n'.join(problems))
+    for problem in problems:
+        logger.warning(problem)
+
+
+def query_budget(max_queries):
+    """Ограничивает число SQL-запросов, которое может сделать view.
+
+    Превышение бюджета и повторяющиеся запросы пишутся в лог, а при
+    QUERY_BUDGET_STRICT = True (в тестах) приводят к исключению.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            collector = QueryCollector()
+            with collector.capture():
+                response = view(request, *args, **kwargs)
+            check_budget(view.__name__, collector, max_queries)
+            return response
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+"""Чтение из реплик базы с привязкой к основной базе после записи.
+
+Реплики - алиасы из DATABASES, перечисленные в DATABASE_REPLICAS.
+Запросы к моделям REPLICATED_MODELS уходят в случайную реплику только
+внутри view с декоратором replica_reads (ленты и страницы постов, где
+отставание реплики на несколько секунд не страшно); всё остальное и
+любая запись идут в основную базу.
+
+Клиент, запрос которого писал в базу, следующие REPLICA_STICKY_SECONDS
+секунд читает только из основной базы (cookie STICKY_COOKIE): автор
+сразу видит новый или исправленный пост, даже если реплика отстаёт.
+
+Всё, что попадает в общие кэши (страницы для гостей, LRU групп и
+авторов), читается из основной базы (force_primary, primary_reads):
+иначе копия отставшей реплики легла бы в кэш под уже новой версией
+ленты. По той же причине у ответов, собранных из реплики, нет ETag и
+Last-Modified.
+"""
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'use_primary'
+REPLICATED_MODELS = {'posts.post', 'posts.group',
+                     settings.AUTH_USER_MODEL.lower()}
+
+# Может ли текущий запрос читать из реплик
+replica_allowed = ContextVar('replica_allowed', default=False)
+# Модели, в которые писал текущий запрос; None - вне запроса
+current_writes = ContextVar('current_writes', default=None)
+# Реплики, из которых читал текущий запрос; None - вне запроса
+current_replica_reads = ContextVar('current_replica_reads', default=None)
+
+
+def is_sticky(request):
+    """Писал ли клиент в базу последние REPLICA_STICKY_SECONDS."""
+    try:
+        until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (replicas and replica_allowed.get()
+                and model._meta.label_lower in REPLICATED_MODELS):
+            alias = random.choice(replicas)
+            reads = current_replica_reads.get()
+            if reads is not None:
+                reads.add(alias)
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = current_writes.get()
+        if writes is not None:
+            writes.add(model._meta.label_lower)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Во всех базах одни и те же данные
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема попадает в реплики вместе с данными
+        return db not in settings.DATABASE_REPLICAS
+
+
+def force_primary(request):
+    """Запрос читает только из основной базы, даже во view с
+    replica_reads."""
+    request._force_primary = True
+
+
+def read_from_replica():
+    """Читал ли текущий запрос что-нибудь из реплик."""
+    return bool(current_replica_reads.get())
+
+
+@contextmanager
+def primary_reads():
+    """Чтения внутри блока идут в основную базу."""
+    token = replica_allowed.set(False)
+    try:
+        yield
+    finally:
+        replica_allowed.reset(token)
+
+
+def replica_reads(view):
+    """Разрешает view читать REPLICATED_MODELS из реплик - если клиент
+    сам недавно не писал в базу."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if is_sticky(request) or getattr(request, '_force_primary', False):
+            return view(request, *args, **kwargs)
+        token = replica_allowed.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            replica_allowed.reset(token)
+    return wrapper
+
+
+class ReplicaMiddleware:
+    """Замечает запись в базу и привязывает клиента к основной базе.
+
+    Стоит после SessionMiddleware: сохранение сессии записью клиента не
+    считается.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes, reads = set(), set()
+        token = current_writes.set(writes)
+        reads_token = current_replica_reads.set(reads)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_writes.reset(token)
+            current_replica_reads.reset(reads_token)
+        if reads:
+            # Валидаторы считаются по основной базе (версии лент), а
+            # содержимое - по реплике, которая может отставать: с ними
+            # клиент получал бы 304 на устаревшую страницу до следующей
+            # записи
+            del response['ETag']
+            del response['Last-Modified']
+        if writes and settings.DATABASE_REPLICAS:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + seconds:.0f}',
+                                max_age=seconds, httponly=True,
+                                samesite='Lax')
+        return response
+
+
+def replicate():
+    """Копирует основную базу SQLite в файлы реплик.
+
+    Замена настоящей репликации для локального запуска: backup API даёт
+    согласованную копию, даже если в основную базу в это время пишут.
+    """
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    for alias in settings.DATABASE_REPLICAS:
+        replica = connections[alias]
+        # Своё соединение с репликой держало бы блокировку файла
+        replica.close()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
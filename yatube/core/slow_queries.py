@@ -0,0 +1,140 @@
+import json
+import logging
+import re
+import traceback
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .models import SlowQuery
+from .query_budget import capture_queries
+
+logger = logging.getLogger(__name__)
+
+# Сколько кадров стека (только кода проекта) сохранять
+STACK_DEPTH = 15
+EXPLAINED_SQL = ('SELECT', 'WITH')
+# Параметры этих запросов в журнал не пишутся: ключи и данные сессий,
+# хеши паролей при записи пользователей
+SESSION_SQL_RE = re.compile(r'\bdjango_session\b')
+USER_WRITE_SQL_RE = re.compile(
+    r'^\s*(INSERT|UPDATE)\b.*\bauth_user\b', re.IGNORECASE | re.DOTALL)
+REDACTED = '[скрыто]'
+
+
+def project_stack():
+    """Стек вызовов без кадров Django, библиотек и этого модуля."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(settings.BASE_DIR)
+        and frame.filename != __file__
+        and '-packages' not in frame.filename
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_DEPTH:]))
+
+
+def logged_params(sql, params):
+    """Параметры запроса для журнала - JSON или REDACTED."""
+    if SESSION_SQL_RE.search(sql) or USER_WRITE_SQL_RE.match(sql):
+        return REDACTED
+    return json.dumps(list(params or ()), ensure_ascii=False, default=str)
+
+
+def explain(connection, sql, params):
+    """План запроса; только для чтения, чтобы не выполнять запись ещё
+    раз. Курсор create_cursor() минует execute_wrapper-ы, поэтому сам
+    EXPLAIN не попадает ни в этот журнал, ни в счётчики запросов."""
+    if not sql.lstrip().upper().startswith(EXPLAINED_SQL):
+        return ''
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else (
+        'EXPLAIN ')
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    except DatabaseError as error:
+        return f'Не удалось получить план: {error}'
+    finally:
+        cursor.close()
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail) - отступ по глубине вложенности
+        depth = {0: -1}
+        lines = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[node] + detail)
+        return '\n'.join(lines)
+    return '\n'.join(' '.join(map(str, row)) for row in rows)
+
+
+class SlowQueryLog:
+    """execute_wrapper, запоминающий запросы дольше порога.
+
+    Записи копятся в памяти и сохраняются методом save() после ответа:
+    запись прямо из обёртки шла бы внутри транзакции view и пропала бы
+    при её откате.
+    """
+
+    def __init__(self, threshold_ms, request=None):
+        self.threshold = threshold_ms / 1000
+        self.request = request
+        self.entries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        result = execute(sql, params, many, context)
+        duration = perf_counter() - started
+        if duration >= self.threshold:
+            self.record(context['connection'], sql, params, many, duration)
+        return result
+
+    def record(self, connection, sql, params, many, duration):
+        match = getattr(self.request, 'resolver_match', None)
+        self.entries.append(SlowQuery(
+            duration=duration * 1000,
+            sql=sql,
+            params=logged_params(sql, params),
+            plan='' if many else explain(connection, sql, params),
+            view=match.view_name if match else '',
+            path=self.request.get_full_path() if self.request else '',
+            stack=project_stack(),
+        ))
+
+    def save(self):
+        if not self.entries:
+            return
+        SlowQuery.objects.bulk_create(self.entries)
+        self.entries = []
+        # Кольцевой буфер: остаются только последние SLOW_QUERY_LOG_SIZE
+        last = SlowQuery.objects.values_list('pk', flat=True).first()
+        SlowQuery.objects.filter(
+            pk__lte=last - settings.SLOW_QUERY_LOG_SIZE).delete()
+
+
+class SlowQueryMiddleware:
+    """Журнал медленных запросов (SLOW_QUERY_THRESHOLD_MS, None - выключен).
+
+    Стоит в MIDDLEWARE первым, чтобы сохранение записей не попадало в
+    профиль и метрики запроса.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold is None:
+            return self.get_response(request)
+        log = SlowQueryLog(threshold, request)
+        try:
+            with capture_queries(log):
+                return self.get_response(request)
+        finally:
+            # Журнал не должен менять ответ: база бывает занята ("database
+            # is locked") как раз тогда, когда запросы медленные
+            try:
+                log.save()
+            except DatabaseError as error:
+                logger.warning('Журнал медленных запросов не сохранён: %s',
+                               error)
@@ -0,0 +1,48 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..lru import MISSING, LRUCache
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_least_recently_used_evicted(self):
+        lru = LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertIs(lru.get('b'), MISSING)
+        self.assertEqual((lru.get('a'), lru.get('c')), (1, 3))
+
+    def test_ttl_and_version(self):
+        lru = LRUCache(ttl=10)
+        with mock.patch('core.lru.time.monotonic', return_value=100):
+            lru.set('slug', None, version=1)
+            # None - закэшированное "не найдено"
+            self.assertIsNone(lru.get('slug', version=1))
+            self.assertIs(lru.get('slug', version=2), MISSING)
+        with mock.patch('core.lru.time.monotonic', return_value=111):
+            self.assertIs(lru.get('slug', version=1), MISSING)
+        self.assertEqual(lru.stats(), {
+            'size': 1, 'hits': 1, 'misses': 2, 'hit_rate': 1 / 3})
+
+    def test_concurrent_access(self):
+        lru = LRUCache(maxsize=50)
+
+        def work(offset):
+            for i in range(2000):
+                key = (offset + i) % 100
+                if lru.get(key) is MISSING:
+                    lru.set(key, key)
+
+        threads = [threading.Thread(target=work, args=(n * 7,))
+                   for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = lru.stats()
+        self.assertEqual(stats['size'], 50)
+        self.assertEqual(stats['hits'] + stats['misses'], 16000)
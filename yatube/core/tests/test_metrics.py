@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..metrics import AGGREGATE_FILE, Counter, Histogram, Registry
+
+User = get_user_model()
+
+
+class RegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = Counter('test_total', 'Счётчик', ('view',),
+                               registry=self.registry)
+        self.histogram = Histogram('test_seconds', 'Время', ('view',),
+                                   buckets=(0.1, 1), registry=self.registry)
+
+    def test_histogram_exposition(self):
+        """Бакеты выводятся накопленными, с +Inf, суммой и счётчиком."""
+        for value in (0.05, 0.1, 0.5, 3):
+            self.histogram.observe(value, view='posts:index')
+        text = self.registry.expose()
+        self.assertIn('# TYPE test_seconds histogram', text)
+        for line in ('test_seconds_bucket{view="posts:index",le="0.1"} 2',
+                     'test_seconds_bucket{view="posts:index",le="1.0"} 3',
+                     'test_seconds_bucket{view="posts:index",le="+Inf"} 4',
+                     'test_seconds_sum{view="posts:index"} 3.65',
+                     'test_seconds_count{view="posts:index"} 4'):
+            self.assertIn(line, text)
+
+    def test_label_values_escaped(self):
+        self.counter.inc(view='a"b\\c')
+        self.assertIn(r'test_total{view="a\"b\\c"} 1.0',
+                      self.registry.expose())
+
+    def test_processes_merged_through_directory(self):
+        """Значения других процессов из METRICS_DIR суммируются со своими."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.counter.inc(2, view='posts:index')
+        self.histogram.observe(0.5, view='posts:index')
+        other = {
+            'test_total': [[['posts:index'], 3], [['posts:profile'], 1]],
+            'test_seconds': [[['posts:index'], [1, 0, 0, 0.05]]],
+        }
+        with open(os.path.join(directory, '1.json'), 'w') as file:
+            json.dump(other, file)
+        with override_settings(METRICS_DIR=directory):
+            self.registry.flush()
+            text = self.registry.expose()
+        self.assertIn('test_total{view="posts:index"} 5.0', text)
+        self.assertIn('test_total{view="posts:profile"} 1.0', text)
+        self.assertIn('test_seconds_count{view="posts:index"} 2', text)
+        self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_finished_processes_folded_into_aggregate(self):
+        """Файлы завершившихся процессов и свой прежний (pid занят
+        повторно) переносятся в aggregate.json - итог не уменьшается."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        finished = {'test_total': [[['posts:index'], 3]]}
+        for pid in (999999999, os.getpid()):
+            with open(os.path.join(directory, f'{pid}.json'), 'w') as file:
+                json.dump(finished, file)
+        with open(os.path.join(directory, AGGREGATE_FILE), 'w') as file:
+            json.dump({'test_total': [[['posts:index'], 1]]}, file)
+        with override_settings(METRICS_DIR=directory):
+            self.registry.fold_finished(directory)
+            self.counter.inc(view='posts:index')
+            self.registry.flush()
+            text = self.registry.expose()
+        self.assertIn('test_total{view="posts:index"} 8.0', text)
+        self.assertEqual(
+            sorted(name for name in os.listdir(directory)
+                   if name.endswith('.json')),
+            sorted([AGGREGATE_FILE, f'{os.getpid()}.json']))
+
+
+class MetricsViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = User.objects.create_user(username='measured')
+        Post.objects.create(text='Пост', author=user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_requests_recorded_per_url_name(self):
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        self.client.get('/unknown-page/')
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('yatube_http_requests_total{view="posts:index",'
+                      'method="GET",status="200"}', text)
+        self.assertIn('yatube_http_requests_total{view="<unmatched>",'
+                      'method="GET",status="404"}', text)
+        self.assertIn('yatube_http_request_duration_seconds_bucket'
+                      '{view="posts:index",le="+Inf"}', text)
+        self.assertIn('yatube_http_request_db_queries_count'
+                      '{view="posts:index"}', text)
+        self.assertIn('yatube_cache_requests_total{view="posts:index",'
+                      'cache="page",result="hit"}', text)
+
+    def test_restricted_to_allowed_ips_and_staff(self):
+        url = reverse('metrics')
+        remote = {'REMOTE_ADDR': '203.0.113.5'}
+        self.assertEqual(self.client.get(url, **remote).status_code, 403)
+        staff = User.objects.create_user(username='admin', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url, **remote).status_code, 200)
@@ -0,0 +1,83 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.base import Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..profiling import original_render
+
+User = get_user_model()
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for metric in header.split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = User.objects.create_user(username='profiled')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=user) for i in range(15))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Server-Timing разбивает время на базу, шаблоны и остальное."""
+        self.client.force_login(User.objects.create_user(
+            username='staff', is_staff=True))
+        with self.assertLogs('core.profiling', 'INFO'):
+            response = self.client.get(reverse('posts:index'), {'page': 1})
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(
+            list(metrics), ['db', 'tpl', 'paginator', 'app', 'total'])
+        self.assertNotEqual(metrics['db']['desc'], '"0 queries"')
+        total = float(metrics['total']['dur'])
+        parts = sum(float(metrics[name]['dur'])
+                    for name in ('db', 'tpl', 'app'))
+        self.assertAlmostEqual(parts, total, delta=0.5)
+        self.assertLessEqual(float(metrics['paginator']['dur']),
+                             float(metrics['tpl']['dur']))
+
+    def test_log_line_tagged_with_view_name(self):
+        """В лог пишется JSON с именем view и числом запросов."""
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'posts:index')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['queries'], 0)
+        self.assertIn('posts/includes/paginator.html', line['templates'])
+
+    def test_server_timing_hidden_from_visitors(self):
+        with self.assertLogs('core.profiling', 'INFO'):
+            response = self.client.get(reverse('posts:index'))
+            self.assertNotIn('Server-Timing', response)
+            with override_settings(PROFILING_SERVER_TIMING_PUBLIC=True):
+                response = self.client.get(reverse('posts:index'),
+                                           {'page': 1})
+            self.assertIn('Server-Timing', response)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request_not_profiled(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_templates_patched_only_while_profiling(self):
+        """Template.render подменяется на время профилируемого запроса и
+        возвращается после него."""
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertTrue(json.loads(logs.records[0].getMessage())['templates'])
+        self.assertIs(Template.render, original_render)
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..query_budget import QueryBudgetExceeded, QueryCollector, query_budget
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for i in range(3):
+            User.objects.create_user(username=f'user{i}')
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    def test_collector_finds_duplicates(self):
+        """Запросы, отличающиеся только параметрами, считаются N+1."""
+        collector = QueryCollector()
+        with collector.capture():
+            for user in User.objects.all():
+                User.objects.filter(pk=user.pk).exists()
+        self.assertEqual(len(collector), 4)
+        self.assertEqual(len(collector.duplicates()), 1)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_budget_exceeded_raises_in_strict_mode(self):
+        @query_budget(1)
+        def view(request):
+            User.objects.count()
+            User.objects.exists()
+            return HttpResponse()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            view(self.request)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_budget_exceeded_is_logged(self):
+        @query_budget(0)
+        def view(request):
+            User.objects.count()
+            return HttpResponse()
+
+        with self.assertLogs('core.query_budget', 'WARNING'):
+            view(self.request)
@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..models import SlowQuery
+from ..slow_queries import REDACTED, SlowQueryLog
+
+User = get_user_model()
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+class SlowQueryLogTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='slow')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_query_logged_with_plan_and_stack(self):
+        """Запись содержит SQL, параметры, view, план и стек вызовов."""
+        self.client.get(reverse('posts:profile', args=[self.user.username]))
+        entry = SlowQuery.objects.filter(
+            view='posts:profile', sql__contains='"auth_user"."username" =',
+            stack__contains='posts/views.py').first()
+        self.assertIsNotNone(entry)
+        self.assertIn('slow', entry.params)
+        self.assertIn('auth_user', entry.plan)
+        self.assertEqual(entry.path, '/profile/slow/')
+
+    def test_secrets_not_logged(self):
+        """Параметры запросов к сессиям и записи пользователей скрыты."""
+        self.user.set_password('old-password-123')
+        self.user.save()
+        self.client.force_login(self.user)
+        self.client.post(reverse('users:password_change'), {
+            'old_password': 'old-password-123',
+            'new_password1': 'new-password-456',
+            'new_password2': 'new-password-456',
+        })
+        for table in ('django_session', 'auth_user'):
+            with self.subTest(table=table):
+                entries = SlowQuery.objects.filter(
+                    sql__contains=f'"{table}"', sql__regex=r'^(INSERT|UPDATE)')
+                self.assertTrue(entries.exists())
+                self.assertEqual(set(entries.values_list('params', flat=True)),
+                                 {REDACTED})
+        self.assertFalse(SlowQuery.objects.filter(
+            params__contains='pbkdf2').exists())
+
+    def test_failed_save_keeps_response(self):
+        with mock.patch.object(SlowQueryLog, 'save', side_effect=(
+                OperationalError('database is locked'))), \
+                self.assertLogs('core.slow_queries', 'WARNING'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SLOW_QUERY_LOG_SIZE=3)
+    def test_only_last_entries_kept(self):
+        self.client.force_login(self.user)
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(SlowQuery.objects.count(), 3)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_disabled(self):
+        self.client.get(reverse('posts:index'))
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_admin_changelist(self):
+        self.client.get(reverse('posts:index'))
+        admin = User.objects.create_superuser('admin', 'admin@example.com',
+                                              'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:core_slowquery_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'posts:index')
@@ -0,0 +1,72 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import RequestFactory, SimpleTestCase
+
+from ..db.middleware import DeferredReadsMiddleware
+from ..db.sqlite3.base import DatabaseWrapper, deferred
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'db.sqlite3')
+        self.wrapper = self.open(DEFAULT_DB_ALIAS)
+
+    def open(self, alias):
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path}, alias=alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        # synchronous = NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+
+    def test_transaction_takes_write_lock_at_begin(self):
+        """Второй писатель ждёт уже на BEGIN, а не получает "database is
+        locked" посреди транзакции."""
+        self.wrapper.ensure_connection()
+        self.wrapper._start_transaction_under_autocommit()
+        self.addCleanup(self.wrapper.connection.rollback)
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+            other.execute('BEGIN IMMEDIATE')
+
+    def test_read_only_transactions_deferred(self):
+        """Реплики и блоки deferred() не берут блокировку записи."""
+        replica = self.open('replica1')
+        replica.ensure_connection()
+        replica._start_transaction_under_autocommit()
+        self.addCleanup(replica.connection.rollback)
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        other.execute('BEGIN IMMEDIATE')
+        other.rollback()
+        self.assertEqual(connection.transaction_mode(), 'IMMEDIATE')
+        with deferred():
+            self.assertEqual(connection.transaction_mode(), 'DEFERRED')
+        self.assertEqual(connection.transaction_mode(), 'IMMEDIATE')
+
+    def test_get_requests_deferred(self):
+        """Транзакции GET-запросов - DEFERRED, POST-запросов - IMMEDIATE."""
+        modes = []
+        middleware = DeferredReadsMiddleware(
+            lambda request: modes.append(connection.transaction_mode()))
+        factory = RequestFactory()
+        middleware(factory.get('/'))
+        middleware(factory.post('/'))
+        self.assertEqual(modes, ['DEFERRED', 'IMMEDIATE'])
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Post, Group
+from .models import Follow, Post, Group
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,5 +15,13 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('user', 'author', 'pull')
+    list_filter = ('pull',)
+    search_fields = ('user__username', 'author__username')
+    raw_id_fields = ('user', 'author')
+
+
 admin.site.register(Post, PostAdmin)
+admin.site.register(Follow, FollowAdmin)
 admin.site.register(Group)
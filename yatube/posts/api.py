@@ -0,0 +1,163 @@
+"""JSON API постов только для чтения.
+
+    GET /api/posts/                        общая лента - 1 запрос
+    GET /api/groups/<slug>/posts/          лента группы - 2 запроса
+    GET /api/profiles/<username>/posts/    лента автора - 2 запроса
+    GET /api/posts/<id>/                   один пост - 1 запрос
+
+Параметры лент: limit (по умолчанию 20, не больше 100), after - курсор
+из поля next предыдущего ответа. Во всех запросах fields=id,author,...
+оставляет в ответе только перечисленные поля (по умолчанию - все).
+Ответ с совпавшим ETag (If-None-Match) - 304; для лент ETag считается по
+версии ленты, без запросов к базе.
+"""
+import hashlib
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition, require_GET
+
+from core.query_budget import query_budget
+from core.replicas import replica_reads
+
+from .cache import (GLOBAL_SCOPE, author_scope, get_version, group_scope,
+                    make_etag)
+from .models import Group, Post, User
+from .paginators import CursorPaginator, InvalidCursor, encode_key
+
+# Поле ответа -> выражение для .values()
+FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated_at': 'updated_at',
+    'author': 'author__username',
+    'group': 'group__slug',
+}
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class InvalidParameter(ValueError):
+    pass
+
+
+def error(message, status=400):
+    return JsonResponse({'error': message}, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def parse_fields(request):
+    value = request.GET.get('fields')
+    if not value:
+        return list(FIELDS)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown:
+        raise InvalidParameter(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise InvalidParameter('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def serialize(row, fields):
+    return {name: row[FIELDS[name]] for name in fields}
+
+
+def post_page(request, post_list):
+    """Страница ленты: строки из .values(), курсор следующей страницы."""
+    try:
+        fields = parse_fields(request)
+        limit = parse_limit(request)
+        # pub_date и id нужны для курсора, даже если их нет в fields
+        lookups = {FIELDS[name] for name in fields} | {'id', 'pub_date'}
+        paginator = CursorPaginator(post_list.values(*lookups), limit)
+        rows = list(paginator.page_queryset(after=request.GET.get('after')))
+    except InvalidParameter as exc:
+        return error(str(exc))
+    except InvalidCursor:
+        return error('Некорректный курсор after')
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        params = request.GET.copy()
+        params['after'] = encode_key(rows[-1]['pub_date'], rows[-1]['id'])
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{params.urlencode()}')
+    return JsonResponse({
+        'results': [serialize(row, fields) for row in rows],
+        'next': next_url,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+def feed_etag(get_scope):
+    """ETag ленты по её версии: 304 отдаётся без запросов к базе.
+
+    slug группы в постах ленты автора учитывается через неё же: при
+    изменении группы сигналы повышают версии лент её авторов.
+    """
+    def etag(request, **kwargs):
+        scope = get_scope(**kwargs)
+        return make_etag('api', scope, get_version(scope),
+                         request.get_full_path())
+    return condition(etag_func=etag)
+
+
+@query_budget(1)
+@require_GET
+@replica_reads
+@feed_etag(lambda: GLOBAL_SCOPE)
+def post_list(request):
+    return post_page(request, Post.objects.all())
+
+
+@query_budget(2)
+@require_GET
+@replica_reads
+@feed_etag(lambda slug: group_scope(slug))
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return error('Группа не найдена', status=404)
+    return post_page(request, Post.objects.filter(group_id=group_id))
+
+
+@query_budget(2)
+@require_GET
+@replica_reads
+@feed_etag(lambda username: author_scope(username))
+def profile_posts(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return error('Автор не найден', status=404)
+    return post_page(request, Post.objects.filter(author_id=author_id))
+
+
+@query_budget(1)
+@require_GET
+@replica_reads
+def post_detail(request, post_id):
+    """Пост; ETag - хэш самого ответа, поэтому учитывает и переименование
+    автора или группы."""
+    try:
+        fields = parse_fields(request)
+    except InvalidParameter as exc:
+        return error(str(exc))
+    row = Post.objects.filter(pk=post_id).values(
+        *{FIELDS[name] for name in fields}).first()
+    if row is None:
+        return error('Пост не найден', status=404)
+    response = JsonResponse(serialize(row, fields),
+                            json_dumps_params={'ensure_ascii': False})
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response['ETag'] = etag
+    return get_conditional_response(request, etag=etag, response=response)
@@ -0,0 +1,325 @@
+import hashlib
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.views.decorators.http import condition
+
+from core.metrics import cache_totals, count_cache
+from core.replicas import force_primary, primary_reads, read_from_replica
+
+from .models import Post
+
+VERSION_KEY = 'posts:feed-version:{scope}'
+MODIFIED_KEY = 'posts:feed-modified:{scope}'
+PAGE_KEY = 'posts:page:{path}'
+PAGE_LOCK_KEY = 'posts:page-lock:{path}'
+
+GLOBAL_SCOPE = 'global'
+# Фрагмент ленты (только посты, без base.html) запрашивается параметром
+# ?fragment=1 или заголовком X-Fragment
+FRAGMENT_PARAM = 'fragment'
+FRAGMENT_HEADER = 'HTTP_X_FRAGMENT'
+
+
+def is_fragment(request):
+    return bool(request.GET.get(FRAGMENT_PARAM)
+                or request.META.get(FRAGMENT_HEADER))
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def get_version(scope):
+    """Текущая версия ленты scope; входит в ключи её страниц."""
+    key = VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        # Версия "с нуля" берётся от времени, чтобы после вытеснения или
+        # истечения ключа не совпасть со старыми страницами, пережившими
+        # его.
+        cache.add(key, int(time.time() * 1000),
+                  settings.POSTS_FEED_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(*scopes):
+    """Инвалидирует все закэшированные страницы перечисленных лент.
+
+    Внутри транзакции версии повышаются сразу и ещё раз после её
+    фиксации: конкурентный запрос, читающий данные до фиксации, успел бы
+    сохранить старую страницу под новой версией, и копия жила бы до
+    следующей записи (страницы UNTIMED_PAGES - без срока).
+    """
+    scopes = set(scopes)
+    increment_versions(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: increment_versions(scopes))
+
+
+def increment_versions(scopes):
+    now = time.time()
+    for scope in scopes:
+        key = VERSION_KEY.format(scope=scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(now * 1000),
+                      settings.POSTS_FEED_VERSION_TIMEOUT)
+        cache.set(MODIFIED_KEY.format(scope=scope), now,
+                  settings.POSTS_FEED_VERSION_TIMEOUT)
+
+
+def get_last_modified(scope, post_list):
+    """Время последнего изменения ленты.
+
+    Обычно берётся из кэша (его пишет bump_versions - так учитываются и
+    удаления), а если ключа там нет - по самому свежему updated_at постов
+    ленты.
+    """
+    key = MODIFIED_KEY.format(scope=scope)
+    modified = cache.get(key)
+    if modified is None:
+        with primary_reads():
+            latest = post_list.aggregate(latest=Max('updated_at'))['latest']
+        modified = latest.timestamp() if latest else 0
+        cache.add(key, modified, settings.POSTS_FEED_VERSION_TIMEOUT)
+    return datetime.fromtimestamp(modified, tz=timezone.utc)
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def feed_cache_stats():
+    """Счётчики кэша страниц: свежие попадания, отданные устаревшие
+    копии (пока страницу пересобирает другой запрос) и промахи.
+
+    Берутся из метрик core.metrics: без METRICS_DIR - только текущего
+    процесса.
+    """
+    totals = cache_totals('page')
+    hits = totals.get('hit', 0)
+    stale = totals.get('stale', 0)
+    misses = totals.get('miss', 0)
+    total = hits + stale + misses
+    return {
+        'hits': hits,
+        'stale': stale,
+        'misses': misses,
+        'hit_rate': (hits + stale) / total if total else 0.0,
+    }
+
+
+# Страницы, которые отдаются гостям из кэша, и ленты, от версий которых
+# они зависят. Страница поста привязана к общей ленте: её версию повышает
+# любая запись поста, группы или автора. Страницы about меняются только
+# с кодом и живут в кэше до истечения срока.
+CACHED_PAGES = {
+    'posts:index': lambda: [GLOBAL_SCOPE],
+    'posts:group_index': lambda: [GLOBAL_SCOPE],
+    'posts:group_list': lambda slug: [group_scope(slug)],
+    'posts:profile': lambda username: [author_scope(username)],
+    'posts:search': lambda: [GLOBAL_SCOPE],
+    'posts:post_detail': lambda post_id: [GLOBAL_SCOPE],
+    'about:author': lambda: [],
+    'about:tech': lambda: [],
+    'posts:index_rss': lambda feed_type: [GLOBAL_SCOPE],
+    'posts:index_atom': lambda feed_type: [GLOBAL_SCOPE],
+    'posts:group_rss': lambda slug, feed_type: [group_scope(slug)],
+    'posts:group_atom': lambda slug, feed_type: [group_scope(slug)],
+    'posts:profile_rss': lambda username, feed_type: [author_scope(username)],
+    'posts:profile_atom': (
+        lambda username, feed_type: [author_scope(username)]),
+}
+# Страницы, копия которых не устаревает по времени, а хранится до
+# повышения версии ленты: RSS/Atom отрисовываются раз на версию. Всё, что
+# в них выводится, должно повышать версию: категория записи - название
+# группы, поэтому сигналы групп повышают и версии лент её авторов.
+UNTIMED_PAGES = {
+    'posts:index_rss', 'posts:index_atom', 'posts:group_rss',
+    'posts:group_atom', 'posts:profile_rss', 'posts:profile_atom',
+}
+# Заголовки ответа, сохраняемые вместе со страницей
+PAGE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary',
+                'X-Next-Cursor')
+
+
+def page_keys(full_path, fragment=False):
+    """Ключи копии страницы и блокировки её пересборки.
+
+    Фрагмент по заголовку X-Fragment имеет тот же адрес, что и целая
+    страница, поэтому хранится под отдельным ключом.
+    """
+    variant = f'{full_path}#fragment' if fragment else full_path
+    path = hashlib.md5(variant.encode()).hexdigest()
+    return PAGE_KEY.format(path=path), PAGE_LOCK_KEY.format(path=path)
+
+
+def cached_response(request, entry):
+    response = HttpResponse(entry['content'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    last_modified = response.get('Last-Modified')
+    return get_conditional_response(
+        request, etag=response.get('ETag'),
+        last_modified=last_modified and parse_http_date_safe(last_modified),
+        response=response)
+
+
+def is_cacheable(request, response):
+    """Можно ли отдать ответ другим гостям: без cookie и CSRF-токена."""
+    return (response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and not read_from_replica())
+
+
+class PageCacheMiddleware:
+    """Отдаёт гостям целые страницы CACHED_PAGES из кэша.
+
+    Ключ зависит от пути с параметрами запроса, а в записи хранятся
+    версии лент страницы: после записи поста (сигналы повышают версии)
+    или через POSTS_PAGE_CACHE_TIMEOUT копия считается устаревшей.
+    Устаревшую страницу пересобирает один запрос - тот, что взял
+    блокировку через cache.add, - а остальные тем временем получают
+    старую копию. Авторизованным кэш не отдаётся: у них другая шапка.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        regenerating = getattr(request, '_page_cache', None)
+        if regenerating is not None:
+            key, lock_key, versions = regenerating
+            try:
+                if is_cacheable(request, response):
+                    self.store(request, key, response, versions)
+                else:
+                    # Страница пропала (пост удалён) - не раздаём её копию
+                    cache.delete(key)
+            finally:
+                if lock_key is not None:
+                    cache.delete(lock_key)
+        return response
+
+    def store(self, request, key, response, versions):
+        expires = timeout = None
+        if request.resolver_match.view_name not in UNTIMED_PAGES:
+            expires = time.time() + settings.POSTS_PAGE_CACHE_TIMEOUT
+            timeout = (settings.POSTS_PAGE_CACHE_TIMEOUT
+                       + settings.POSTS_PAGE_CACHE_STALE_TIMEOUT)
+        cache.set(key, {
+            'content': response.content,
+            'headers': {header: response[header]
+                        for header in PAGE_HEADERS
+                        if response.has_header(header)},
+            'versions': versions,
+            'expires': expires,
+        }, timeout)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        get_scopes = CACHED_PAGES.get(match.view_name)
+        if (get_scopes is None or request.method != 'GET'
+                or request.user.is_authenticated):
+            return None
+        key, lock_key = page_keys(request.get_full_path(),
+                                  is_fragment(request))
+        versions = [get_version(scope) for scope in get_scopes(**match.kwargs)]
+        entry = cache.get(key)
+        if (entry is not None and entry['versions'] == versions
+                and (entry['expires'] is None
+                     or entry['expires'] > time.time())):
+            count_cache(request, 'page', hit=True)
+            return cached_response(request, entry)
+        if entry is None:
+            # Копии нет вовсе - отдавать другим нечего, блокировка не нужна
+            lock_key = None
+        elif not cache.add(lock_key, 1,
+                           settings.POSTS_PAGE_CACHE_LOCK_TIMEOUT):
+            # Страницу уже пересобирает другой запрос
+            count_cache(request, 'page', hit=True, stale=True)
+            return cached_response(request, entry)
+        count_cache(request, 'page', hit=False)
+        # Копия будет отдаваться всем гостям до следующей версии ленты
+        force_primary(request)
+        request._page_cache = (key, lock_key, versions)
+        return None
+
+
+def conditional_feed(get_scope, get_posts):
+    """Conditional GET для ленты: ETag и Last-Modified без основных
+    запросов view.
+
+    ETag зависит от версии ленты, адреса (номер страницы или курсор),
+    режима фрагмента и пользователя, а для авторизованных - и от
+    CSRF-cookie: в их страницах есть формы (подписка в профиле), и после
+    повторного входа с новым токеном копия из кэша браузера с прежним
+    токеном давала бы 403. Last-Modified не различает пользователей,
+    поэтому отдаётся только гостям.
+    """
+    def etag(request, **kwargs):
+        scope = get_scope(**kwargs)
+        csrf = (request.META.get('CSRF_COOKIE')
+                if request.user.is_authenticated else None)
+        return make_etag(scope, get_version(scope), request.get_full_path(),
+                         is_fragment(request), request.user.pk, csrf)
+
+    def last_modified(request, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        return get_last_modified(get_scope(**kwargs), get_posts(**kwargs))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def post_validators(request, post_id):
+    """ETag и Last-Modified страницы поста; один запрос на оба."""
+    if not hasattr(request, '_post_validators'):
+        with primary_reads():
+            row = Post.objects.filter(pk=post_id).values_list(
+                'updated_at', 'author__username', 'group__slug').first()
+        request._post_validators = (None, None)
+        if row is not None:
+            updated_at, username, slug = row
+            # Число постов автора и название группы на странице меняются
+            # вместе с версиями их лент
+            scopes = [author_scope(username)]
+            if slug:
+                scopes.append(group_scope(slug))
+            etag = make_etag(
+                updated_at.isoformat(), request.user.pk,
+                *(get_version(scope) for scope in scopes))
+            modified = cache.get_many(
+                [MODIFIED_KEY.format(scope=scope) for scope in scopes])
+            last_modified = max(
+                [updated_at] + [datetime.fromtimestamp(value, tz=timezone.utc)
+                                for value in modified.values()])
+            if request.user.is_authenticated:
+                last_modified = None
+            request._post_validators = (etag, last_modified)
+    return request._post_validators
+
+
+conditional_post = condition(
+    etag_func=lambda request, post_id: post_validators(request, post_id)[0],
+    last_modified_func=(
+        lambda request, post_id: post_validators(request, post_id)[1]),
+)
@@ -0,0 +1,115 @@
+import csv
+import json
+import zlib
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Post
+
+FORMATS = ('jsonl', 'csv')
+# Имена колонок совпадают с теми, что читает import_posts
+COLUMNS = ('text', 'pub_date', 'author', 'group')
+FIELDS = ('text', 'pub_date', 'author__username', 'group__slug')
+CHUNK_SIZE = 2000
+# Строки выгрузки отдаются блоками примерно такого размера
+FLUSH_SIZE = 64 * 1024
+
+
+def parse_moment(value, end_of_day=False):
+    """Дата или дата-время из параметра фильтра; None, если не разобрать."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            moment = datetime.combine(day, time.max if end_of_day else time())
+    except ValueError:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.utc)
+    return moment
+
+
+def export_rows(group=None, author=None, since=None, until=None):
+    """Кортежи (text, pub_date, username, slug) в порядке id.
+
+    Авторы и группы подтягиваются JOIN-ом в том же запросе, а строки
+    читаются через iterator() пачками - без кэша queryset, поэтому память
+    не растёт с числом постов.
+    """
+    posts = Post.objects.order_by('pk')
+    if group:
+        posts = posts.filter(group__slug=group)
+    if author:
+        posts = posts.filter(author__username=author)
+    if since:
+        posts = posts.filter(pub_date__gte=since)
+    if until:
+        posts = posts.filter(pub_date__lte=until)
+    return posts.values_list(*FIELDS).iterator(chunk_size=CHUNK_SIZE)
+
+
+def jsonl_lines(rows):
+    for text, pub_date, author, group in rows:
+        yield json.dumps({
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'author': author,
+            'group': group,
+        }, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку, а не
+    пишет её."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+    for text, pub_date, author, group in rows:
+        yield writer.writerow(
+            (text, pub_date.isoformat(), author, group or ''))
+
+
+def serialize(rows, data_format):
+    lines = csv_lines(rows) if data_format == 'csv' else jsonl_lines(rows)
+    return (line.encode() for line in lines)
+
+
+def gzip_stream(chunks):
+    """Сжимает поток байтов в формат gzip на лету."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def buffered(chunks, size=FLUSH_SIZE):
+    """Склеивает мелкие куски в блоки около size байт."""
+    buffer = []
+    buffered_size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield b''.join(buffer)
+            buffer, buffered_size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def export_stream(rows, data_format, compress=False):
+    """Байты выгрузки блоками по FLUSH_SIZE."""
+    chunks = serialize(rows, data_format)
+    if compress:
+        chunks = gzip_stream(chunks)
+    return buffered(chunks)
@@ -0,0 +1,147 @@
+from django.contrib.syndication.views import Feed
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+
+from core.query_budget import query_budget
+from core.replicas import replica_reads
+
+from .cache import GLOBAL_SCOPE, author_scope, conditional_feed, group_scope
+from .lookups import get_author_or_404, get_group_or_404
+from .models import Post
+from .views import feed_posts
+
+FEED_TYPES = {
+    'rss': Rss201rev2Feed,
+    'atom': Atom1Feed,
+}
+# Сколько последних постов отдавать в ленте
+FEED_SIZE = 20
+
+
+class PostsFeed(Feed):
+    """Лента последних постов в формате RSS 2.0 или Atom.
+
+    Готовые ленты хранит PageCacheMiddleware до записи поста в них,
+    а ETag/Last-Modified (conditional_feed) позволяют читателям лент
+    получать 304 без отрисовки.
+    """
+
+    def __init__(self, feed_type):
+        self.feed_type = FEED_TYPES[feed_type]
+
+    def posts(self, obj):
+        raise NotImplementedError
+
+    def items(self, obj):
+        return self.posts(obj)[:FEED_SIZE]
+
+    def subtitle(self, obj):
+        # Описание ленты в Atom
+        return self.description(obj)
+
+    def item_title(self, post):
+        return Truncator(post.text).chars(60)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.updated_at
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group else []
+
+
+class LatestPostsFeed(PostsFeed):
+    title = 'Yatube: последние обновления'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def description(self, obj=None):
+        return 'Новые записи всех авторов'
+
+    def posts(self, obj):
+        return feed_posts()
+
+
+class GroupPostsFeed(PostsFeed):
+    def get_object(self, request, slug, **kwargs):
+        return get_group_or_404(request, slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def description(self, group):
+        return group.description
+
+    def posts(self, group):
+        return feed_posts(group=group)
+
+
+class AuthorPostsFeed(PostsFeed):
+    def get_object(self, request, username, **kwargs):
+        return get_author_or_404(request, username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def posts(self, author):
+        return feed_posts(author=author)
+
+
+def render_feed(feed, request, **kwargs):
+    response = feed(request, **kwargs)
+    # Feed ставит Last-Modified по самому свежему посту, а conditional_feed
+    # сверяет If-Modified-Since со временем изменения ленты (в нём учтены и
+    # удаления) - отдаём клиенту его
+    del response['Last-Modified']
+    return response
+
+
+# Бюджеты: посты ленты (с объектом группы или автора - ещё запрос) и,
+# если времени изменения ленты нет в кэше, запрос за Last-Modified
+@query_budget(2)
+@replica_reads
+@conditional_feed(lambda feed_type: GLOBAL_SCOPE,
+                  lambda feed_type: Post.objects.all())
+def index_feed(request, feed_type):
+    return render_feed(LatestPostsFeed(feed_type), request)
+
+
+@query_budget(3)
+@replica_reads
+@conditional_feed(lambda slug, feed_type: group_scope(slug),
+                  lambda slug, feed_type: Post.objects.filter(
+                      group__slug=slug))
+def group_feed(request, slug, feed_type):
+    return render_feed(GroupPostsFeed(feed_type), request, slug=slug)
+
+
+@query_budget(3)
+@replica_reads
+@conditional_feed(lambda username, feed_type: author_scope(username),
+                  lambda username, feed_type: Post.objects.filter(
+                      author__username=username))
+def profile_feed(request, username, feed_type):
+    return render_feed(AuthorPostsFeed(feed_type), request,
+                       username=username)
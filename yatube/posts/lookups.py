@@ -0,0 +1,51 @@
+"""Группы по slug и авторы по username из LRU-кэша процесса.
+
+Страницы групп и профилей ищут их на каждом запросе, а меняются они
+редко. Кэшируется и отсутствие объекта, так что перебор несуществующих
+адресов не доходит до базы. Записи привязаны к версиям лент
+(posts.cache): изменение группы или автора, а для автора и его постов
+(число постов в профиле), сбрасывает их во всех процессах; в своём
+процессе сигналы (posts.signals) удаляют их сразу.
+"""
+from django.conf import settings
+from django.http import Http404
+
+from core.lru import MISSING, LRUCache
+from core.metrics import count_cache
+from core.replicas import primary_reads
+
+from .cache import author_scope, get_version, group_scope
+from .models import Group, User
+
+GROUPS = LRUCache(settings.POSTS_LOOKUP_CACHE_SIZE,
+                  settings.POSTS_LOOKUP_CACHE_TTL)
+AUTHORS = LRUCache(settings.POSTS_LOOKUP_CACHE_SIZE,
+                   settings.POSTS_LOOKUP_CACHE_TTL)
+
+
+def lookup(request, lru, cache_name, key, scope, load):
+    version = get_version(scope)
+    value = lru.get(key, version)
+    count_cache(request, cache_name, hit=value is not MISSING)
+    if value is MISSING:
+        # Запись живёт в кэше до ttl - отставшая реплика оставила бы в
+        # нём устаревший объект или ложное "не найдено"
+        with primary_reads():
+            value = load()
+        lru.set(key, value, version)
+    if value is None:
+        raise Http404(f'Не найдено: {key}')
+    return value
+
+
+def get_group_or_404(request, slug):
+    return lookup(request, GROUPS, 'groups', slug, group_scope(slug),
+                  lambda: Group.objects.filter(slug=slug).first())
+
+
+def get_author_or_404(request, username):
+    """Автор вместе со статистикой постов (post_stats)."""
+    return lookup(request, AUTHORS, 'authors', username,
+                  author_scope(username),
+                  lambda: User.objects.select_related('post_stats').filter(
+                      username=username).first())
@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+from posts.paginators import CursorPaginator, encode_cursor
+from posts.timeline import TimelinePaginator
+from posts.views import detail_post_queryset, feed_posts
+
+# Признаки плохого плана в выводе EXPLAIN QUERY PLAN SQLite
+TEMP_SORT = 'USE TEMP B-TREE'
+SCAN = 'SCAN'
+INDEXED_SCAN = ('USING INDEX', 'USING COVERING INDEX',
+                'USING INTEGER PRIMARY KEY')
+KEYSET_RANGE = ('pub_date<', 'pub_date>')
+
+
+def plan_problems(plan, keyset=False):
+    """Строки плана с полным просмотром таблицы или сортировкой.
+
+    Для курсорных страниц (keyset=True) проблемой считается и просмотр
+    индекса без диапазона по pub_date: такой запрос читает ленту с самого
+    начала, и его время растёт с глубиной страницы.
+    """
+    problems = []
+    if keyset and not any(key in plan for key in KEYSET_RANGE):
+        problems.append('нет поиска по диапазону pub_date')
+    for line in plan.splitlines():
+        if TEMP_SORT in line:
+            problems.append(line.strip())
+        elif SCAN in line.split() and not any(
+                marker in line for marker in INDEXED_SCAN):
+            problems.append(line.strip())
+    return problems
+
+
+def feed_querysets(per_page=10):
+    """Запросы, которые строят views из posts.views, по одному на каждый
+    вариант страницы: первая, следующая (?after=), предыдущая (?before=)
+    и номерная (?page=). Возвращает тройки (имя, queryset, keyset)."""
+    # Конкретные значения параметров на план не влияют, поэтому данных в
+    # базе для проверки не нужно.
+    group, author = Group(pk=1), User(pk=1)
+    cursor = encode_cursor(Post(pk=1, pub_date=timezone.now()))
+    feeds = {
+        'posts:index': feed_posts(),
+        'posts:group_list': feed_posts(group=group),
+        'posts:profile': feed_posts(author=author),
+    }
+    for name, post_list in feeds.items():
+        paginator = CursorPaginator(post_list, per_page)
+        yield name, paginator.page_queryset(), False
+        yield (f'{name} ?after=',
+               paginator.page_queryset(after=cursor), True)
+        yield (f'{name} ?before=',
+               paginator.page_queryset(before=cursor), True)
+        yield f'{name} ?page=', post_list[per_page:per_page * 2], False
+    # Лента подписок: записи пользователя и посты авторов с pull = True.
+    # Авторов несколько: с одним не видно сортировки их постов вместе.
+    timeline = TimelinePaginator(author, per_page, pulled=[1, 2, 3])
+    for name, page_queryset in (
+            ('posts:follow_index', timeline.entries_queryset),
+            ('posts:follow_index (pull)', timeline.pulled_queryset)):
+        yield name, page_queryset(), False
+        yield f'{name} ?after=', page_queryset(after=cursor), True
+        yield f'{name} ?before=', page_queryset(before=cursor), True
+    yield 'posts:post_detail', detail_post_queryset().filter(pk=1), False
+    yield 'posts:profile (автор)', User.objects.select_related(
+        'post_stats').filter(username='username'), False
+    yield ('posts:group_list (группа)',
+           Group.objects.filter(slug='slug'), False)
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN QUERY PLAN для запросов лент из posts.views '
+            'и сообщает о полных просмотрах таблиц и сортировках')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы всех запросов, а не только проблемных')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'Разбор планов поддерживается только для SQLite')
+        failed = 0
+        for name, queryset, keyset in feed_querysets():
+            plan = queryset.explain()
+            problems = plan_problems(plan, keyset)
+            if problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'{name}:'))
+                for line in problems:
+                    self.stdout.write(f'    {line}')
+            elif options['verbose_plans']:
+                self.stdout.write(self.style.SUCCESS(f'{name}:'))
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+        if failed:
+            raise CommandError(f'Запросов с плохим планом: {failed}')
+        self.stdout.write(self.style.SUCCESS('Все ленты читаются по индексам'))
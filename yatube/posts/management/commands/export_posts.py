@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, export_rows, export_stream, parse_moment
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты (текст, дата, автор, группа) в JSONL '
+            'или CSV, при необходимости сжимая в gzip')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='Файл для выгрузки; по умолчанию - стандартный вывод')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Сжимать выгрузку в gzip')
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--author', help='username автора')
+        parser.add_argument('--since', help='Не раньше даты (ISO 8601)')
+        parser.add_argument('--until', help='Не позже даты (ISO 8601)')
+
+    def handle(self, *args, **options):
+        filters = {'group': options['group'], 'author': options['author']}
+        for name, end_of_day in (('since', False), ('until', True)):
+            if options[name]:
+                filters[name] = parse_moment(options[name], end_of_day)
+                if filters[name] is None:
+                    raise CommandError(
+                        f'Некорректная дата --{name}: {options[name]}')
+        chunks = export_stream(
+            export_rows(**filters), options['format'], options['gzip'])
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.cache import feed_cache_stats
+
+
+class Command(BaseCommand):
+    help = ('Показывает попадания и промахи кэша страниц для гостей. '
+            'Счётчики ведёт каждый процесс сайта в своей памяти, поэтому '
+            'команда видит их только через общий каталог метрик '
+            'METRICS_DIR (YATUBE_METRICS_DIR)')
+
+    def handle(self, *args, **options):
+        if not settings.METRICS_DIR:
+            raise CommandError(
+                'Не задан METRICS_DIR: счётчики процессов сайта недоступны')
+        stats = feed_cache_stats()
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, устаревших копий: {stats["stale"]}, '
+            f'промахов: {stats["misses"]}, '
+            f'доля попаданий: {stats["hit_rate"]:.1%}')
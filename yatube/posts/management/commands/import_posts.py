@@ -0,0 +1,262 @@
+import csv
+import io
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.cache import GLOBAL_SCOPE, author_scope, bump_versions, group_scope
+from posts.models import AuthorStats, Group, GroupStats, Post, User
+from posts.search import index_posts_after
+from posts.timeline import fan_out_after
+
+FORMATS = ('jsonl', 'csv')
+# Сколько первых ошибочных строк показывать подробно
+MAX_REPORTED_ERRORS = 10
+
+
+class RowError(ValueError):
+    pass
+
+
+def create_posts(posts):
+    """bulk_create, сохраняющий даты из файла.
+
+    bulk_create проставляет pub_date (auto_now_add) временем вставки,
+    поэтому даты из файла записываются следом через bulk_update - без
+    правки метаданных модели, общих для всего процесса. SQLite выдаёт
+    id новым строкам по порядку вставки, а транзакция записи начинается
+    с BEGIN IMMEDIATE, так что чужие посты между ними не вклиниваются.
+    """
+    dates = [post.pub_date for post in posts]
+    with transaction.atomic():
+        last_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        Post.objects.bulk_create(posts)
+        ids = Post.objects.filter(pk__gt=last_id).order_by(
+            'pk').values_list('pk', flat=True)
+        dated = []
+        for post, pk, pub_date in zip(posts, ids, dates):
+            post.pk = pk
+            if pub_date is not None:
+                post.pub_date = pub_date
+                dated.append(post)
+        if dated:
+            Post.objects.bulk_update(dated, ['pub_date'])
+
+
+class Lookup:
+    """Кэш соответствия имя -> id (username для авторов, slug для групп).
+
+    Неизвестные имена загружаются пачкой, одним запросом на пачку строк.
+    """
+
+    def __init__(self, model, field, create=False):
+        self.model = model
+        self.field = field
+        self.create = create
+        self.ids = {}
+
+    def load(self, names):
+        # Не строки (список или объект в JSON) отбросит build_post
+        missing = {name for name in names
+                   if isinstance(name, str)} - self.ids.keys()
+        if not missing:
+            return
+        found = self.model.objects.filter(
+            **{f'{self.field}__in': missing}).values_list(self.field, 'pk')
+        self.ids.update(found)
+        missing -= self.ids.keys()
+        if missing and self.create:
+            self.model.objects.bulk_create(
+                self.new_object(name) for name in missing)
+            self.ids.update(self.model.objects.filter(
+                **{f'{self.field}__in': missing}
+            ).values_list(self.field, 'pk'))
+
+    def new_object(self, name):
+        if self.model is Group:
+            return Group(slug=name, title=name, description='')
+        user = User(username=name)
+        user.set_unusable_password()
+        return user
+
+    def __getitem__(self, name):
+        if name not in self.ids:
+            raise RowError(
+                f'не найден {self.model._meta.verbose_name} «{name}»')
+        return self.ids[name]
+
+
+def read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                yield RowError(f'некорректный JSON: {error}')
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def parse_pub_date(value):
+    try:
+        pub_date = parse_datetime(value)
+    except ValueError:
+        pub_date = None
+    if pub_date is None:
+        raise RowError(f'некорректная дата «{value}»')
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date, timezone.utc)
+    return pub_date
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает посты из JSONL или CSV (поля text, author, '
+            'group, pub_date) пачками через bulk_create')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source', help='Путь к файлу или "-" для стандартного ввода')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат входных данных; по умолчанию - по расширению файла')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов вставлять в одной транзакции')
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы, а не пропускать '
+                 'их посты')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        source = options['source']
+        data_format = options['format'] or (
+            'csv' if source.endswith('.csv') else 'jsonl')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        self.authors = Lookup(User, 'username', options['create_missing'])
+        self.groups = Lookup(Group, 'slug', options['create_missing'])
+        self.author_counts = Counter()
+        self.group_counts = Counter()
+        self.errors = 0
+
+        if source == '-':
+            # newline='': в CSV поля бывают многострочными
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8',
+                                      newline='')
+        else:
+            try:
+                stream = open(source, encoding='utf-8', newline='')
+            except OSError as error:
+                raise CommandError(error)
+        reader = read_csv if data_format == 'csv' else read_jsonl
+        with stream:
+            self.load(reader(stream), options['batch_size'])
+
+    def load(self, rows, batch_size):
+        last_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        started = time.monotonic()
+        imported = line = 0
+        try:
+            while True:
+                # В памяти одновременно только одна пачка строк
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                posts = self.build_posts(batch, first_line=line + 1)
+                line += len(batch)
+                create_posts(posts)
+                for post in posts:
+                    self.author_counts[post.author_id] += 1
+                    if post.group_id:
+                        self.group_counts[post.group_id] += 1
+                imported += len(posts)
+                self.report_progress(line, imported, started)
+        finally:
+            # И при сбое посередине уже загруженные пачки должны попасть
+            # в счётчики, поисковый индекс и ленты подписок
+            self.finish(last_id)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено постов: {imported} за {elapsed:.1f} с '
+            f'({imported / elapsed if elapsed else 0:.0f} постов/с), '
+            f'пропущено строк: {self.errors}'))
+
+    def report_progress(self, line, imported, started):
+        """Скорость загрузки после каждой пачки - при -v 2."""
+        if self.verbosity < 2:
+            return
+        elapsed = time.monotonic() - started
+        self.stderr.write(f'{line} строк, загружено {imported} постов, '
+                          f'{imported / elapsed:.0f} постов/с')
+
+    def build_posts(self, batch, first_line):
+        """Посты пачки; строки с ошибками пропускаются с сообщением."""
+        self.authors.load(
+            row.get('author') for row in batch if isinstance(row, dict))
+        self.groups.load(
+            row.get('group') or None for row in batch
+            if isinstance(row, dict))
+        posts = []
+        for number, row in enumerate(batch, start=first_line):
+            try:
+                posts.append(self.build_post(row))
+            except RowError as error:
+                self.errors += 1
+                if self.errors <= MAX_REPORTED_ERRORS:
+                    self.stderr.write(f'Строка {number}: {error}')
+        return posts
+
+    def build_post(self, row):
+        if isinstance(row, RowError):
+            raise row
+        if not isinstance(row, dict):
+            raise RowError('строка должна быть объектом JSON')
+        if not row.get('text'):
+            raise RowError('пустой текст')
+        for field in ('text', 'author', 'group', 'pub_date'):
+            if row.get(field) and not isinstance(row[field], str):
+                raise RowError(f'поле {field} должно быть строкой')
+        author = row.get('author')
+        group = row.get('group') or None
+        post = Post(
+            text=row['text'],
+            author_id=self.authors[author],
+            group_id=self.groups[group] if group else None,
+            # Без даты в файле - время вставки (auto_now_add)
+            pub_date=parse_pub_date(row['pub_date'])
+            if row.get('pub_date') else None,
+        )
+        # bulk_create минует Post.save()
+        post.render_html()
+        return post
+
+    def finish(self, last_id):
+        """То, что при обычном сохранении делают сигналы, - один раз на
+        всю загрузку: счётчики, поисковый индекс, ленты подписок и версии
+        кэша лент."""
+        with transaction.atomic():
+            for author_id, added in self.author_counts.items():
+                AuthorStats.add(author_id, added)
+            for group_id, added in self.group_counts.items():
+                GroupStats.add(group_id, added)
+            GroupStats.refresh_last_posts(list(self.group_counts))
+            index_posts_after(last_id)
+            fan_out_after(last_id)
+        bump_versions(
+            GLOBAL_SCOPE,
+            *(author_scope(name) for name, pk in self.authors.ids.items()
+              if pk in self.author_counts),
+            *(group_scope(slug) for slug, pk in self.groups.ids.items()
+              if pk in self.group_counts),
+        )
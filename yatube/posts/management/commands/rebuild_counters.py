@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import AuthorStats, GroupStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов авторов и групп'
+
+    def handle(self, *args, **options):
+        for model in (AuthorStats, GroupStats):
+            model.rebuild()
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'{model.objects.count()} записей')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import User
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает ленты подписок: заново определяет авторов, чьи '
+            'посты читаются при показе ленты, и раскладывает последние '
+            'посты остальных по лентам подписчиков')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пересобрать ленты только этих пользователей')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = list(User.objects.filter(
+                username__in=options['usernames']))
+            missing = set(options['usernames']) - {
+                user.username for user in users}
+            if missing:
+                raise CommandError(
+                    f'Нет пользователей: {", ".join(sorted(missing))}')
+        entries = rebuild_timelines(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты подписок пересобраны, записей: {entries}'))
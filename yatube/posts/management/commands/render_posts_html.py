@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.cache import GLOBAL_SCOPE, author_scope, bump_versions, group_scope
+from posts.models import Group, Post, User
+from posts.rendering import RENDERER_VERSION
+
+
+class Command(BaseCommand):
+    help = ('Заново отрисовывает HTML текста постов, сохранённый другой '
+            'версией отрисовки (или всех постов с --all)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true',
+                            help='Перерисовать и посты текущей версии')
+
+    def handle(self, *args, batch_size, **options):
+        posts = Post.objects.order_by('pk').only(
+            'pk', 'text', 'author_id', 'group_id')
+        if not options['all']:
+            posts = posts.exclude(text_html_version=RENDERER_VERSION)
+        rendered = 0
+        author_ids, group_ids = set(), set()
+        last_pk = 0
+        while True:
+            # Пачки по id: каждая - короткая транзакция, а
+            # перерисованные посты не перечитываются
+            batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for post in batch:
+                post.render_html()
+                author_ids.add(post.author_id)
+                group_ids.add(post.group_id)
+            with transaction.atomic():
+                Post.objects.bulk_update(
+                    batch, ['text_html', 'text_html_version'])
+            rendered += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Перерисовано постов: {rendered}')
+        if rendered:
+            # updated_at не меняется, поэтому закэшированные страницы
+            # сбрасываются явно
+            bump_versions(
+                GLOBAL_SCOPE,
+                *(author_scope(name) for name in User.objects.filter(
+                    pk__in=author_ids).values_list('username', flat=True)),
+                *(group_scope(slug) for slug in Group.objects.filter(
+                    pk__in=group_ids - {None}).values_list('slug', flat=True)),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: перерисовано {rendered}, версия {RENDERER_VERSION}'))
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def fill_last_posts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    latest = (Post.objects.filter(group_id=OuterRef('pk'))
+              .order_by('-pub_date', '-pk'))
+    GroupStats.objects.update(
+        last_post_at=Subquery(latest.values('pub_date')[:1]),
+        last_author=Subquery(latest.values('author_id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_follow_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupstats',
+            name='last_author',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор последнего поста'),
+        ),
+        migrations.AddField(
+            model_name='groupstats',
+            name='last_post_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата последнего поста'),
+        ),
+        migrations.RunPython(fill_last_posts, migrations.RunPython.noop),
+    ]
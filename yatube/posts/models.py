@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import (Case, Count, DateTimeField, F, IntegerField,
+                              OuterRef, Q, Subquery, Value, When)
 from django.contrib.auth import get_user_model
+from django.utils.safestring import mark_safe
+
+from .rendering import RENDERER_VERSION, render_text
 
 User = get_user_model()
 
@@ -17,11 +22,16 @@ class Post(models.Model):
     text = models.TextField(
         verbose_name="Текст поста", help_text='Введите текст поста')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    # post_edit меняет пост, не трогая pub_date; по этому полю строятся
+    # Last-Modified/ETag страниц
+    updated_at = models.DateTimeField(
+        'Дата изменения', auto_now=True, db_index=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -30,11 +40,302 @@ class Post(models.Model):
         on_delete=models.SET_NULL,
         related_name='posts',
         verbose_name="Группа",
-        help_text='Группа, к которой будет относиться пост'
+        help_text='Группа, к которой будет относиться пост',
+        db_index=False
     )
+    # Текст, заранее отрисованный в HTML (posts.rendering), чтобы
+    # ленты не прогоняли его через фильтры при каждом показе
+    text_html = models.TextField('Текст в HTML', blank=True, editable=False)
+    text_html_version = models.PositiveSmallIntegerField(
+        'Версия отрисовки', default=0, editable=False)
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def html(self):
+        """Текст для шаблонов. Посты, которые ещё не перерисовала
+        команда render_posts_html, отрисовываются на лету."""
+        if self.text_html_version != RENDERER_VERSION:
+            return mark_safe(render_text(self.text))
+        return mark_safe(self.text_html)
+
+    def render_html(self):
+        self.text_html = render_text(self.text)
+        self.text_html_version = RENDERER_VERSION
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Отложенный (.only/.defer) текст не сохраняется - и HTML тоже
+        if 'text' in self.__dict__ and (
+                update_fields is None or 'text' in update_fields):
+            self.render_html()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'text_html', 'text_html_version'}
+        # Счётчики постов обновляются в сигналах post_save - в той же
+        # транзакции, что и сама запись.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-pub_date']
+        # Индексы под ленты: ORDER BY -pub_date, -id (курсорный
+        # паджинатор) без сортировки во временном B-tree. Составные
+        # индексы заменяют и одиночные индексы по author_id/group_id.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
+
+
+class PostsCounter(models.Model):
+    """Денормализованное число постов, чтобы не делать COUNT(*)."""
+    # Имя поля Post, по которому ведётся подсчёт
+    counted_by = None
+
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def add(cls, pk, delta):
+        """Атомарно меняет счётчик объекта pk на delta."""
+        if pk is None:
+            return
+        rows = cls.objects.filter(pk=pk)
+        if rows.update(posts_count=F('posts_count') + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(pk=pk, posts_count=delta)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос
+            rows.update(posts_count=F('posts_count') + delta)
+
+    @classmethod
+    def rebuild(cls):
+        """Пересчитывает все счётчики по таблице Post."""
+        counts = (Post.objects.order_by()
+                  .filter(**{f'{cls.counted_by}__isnull': False})
+                  .values_list(cls.counted_by)
+                  .annotate(total=Count('pk')))
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                (cls(pk=pk, posts_count=total) for pk, total in counts),
+                batch_size=500,
+            )
+
+
+class AuthorStats(PostsCounter):
+    counted_by = 'author'
+
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='post_stats',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+
+class GroupStats(PostsCounter):
+    """Число постов группы и её последний пост - для каталога групп.
+
+    Строка удаляется каскадом вместе с группой; посты при этом получают
+    group = NULL одним UPDATE без сигналов, и пересчитывать больше
+    нечего.
+    """
+    counted_by = 'group'
+
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа'
+    )
+    last_post_at = models.DateTimeField(
+        'Дата последнего поста', null=True, blank=True)
+    last_author = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Автор последнего поста'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+
+    @staticmethod
+    def latest_post(field):
+        """Подзапрос: поле последнего поста группы (по индексу
+        post_group_pub_date_idx)."""
+        return Subquery(
+            Post.objects.filter(group_id=OuterRef('pk'))
+            .order_by('-pub_date', '-pk').values(field)[:1])
+
+    @classmethod
+    def add_post(cls, pk, post):
+        """+1 пост в группе pk; post становится последним, если он не
+        старше уже учтённого (импорт может загружать старые посты).
+
+        Счётчик и последний пост меняются одним UPDATE.
+        """
+        if pk is None:
+            return
+        newer = (Q(last_post_at__isnull=True)
+                 | Q(last_post_at__lte=post.pub_date))
+        rows = cls.objects.filter(pk=pk)
+        changes = {
+            'posts_count': F('posts_count') + 1,
+            'last_post_at': Case(
+                When(newer, then=Value(post.pub_date,
+                                       output_field=DateTimeField())),
+                default=F('last_post_at'), output_field=DateTimeField()),
+            'last_author': Case(
+                When(newer, then=Value(post.author_id)),
+                default=F('last_author'),
+                output_field=IntegerField()),
+        }
+        if rows.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(pk=pk, posts_count=1,
+                                   last_post_at=post.pub_date,
+                                   last_author_id=post.author_id)
+        except IntegrityError:
+            rows.update(**changes)
+
+    @classmethod
+    def remove_post(cls, pk, post):
+        """-1 пост в группе pk. Если post был последним (его уже нет в
+        группе), последний пост ищется заново подзапросом в том же
+        UPDATE."""
+        if pk is None:
+            return
+        stale = Q(last_post_at__lte=post.pub_date)
+        cls.objects.filter(pk=pk).update(
+            posts_count=F('posts_count') - 1,
+            last_post_at=Case(
+                When(stale, then=cls.latest_post('pub_date')),
+                default=F('last_post_at'), output_field=DateTimeField()),
+            last_author=Case(
+                When(stale, then=cls.latest_post('author_id')),
+                default=F('last_author'),
+                output_field=IntegerField()),
+        )
+
+    @classmethod
+    def refresh_last_posts(cls, pks=None):
+        """Пересчитывает последние посты групп pks (по умолчанию всех)."""
+        rows = cls.objects.all() if pks is None else cls.objects.filter(
+            pk__in=pks)
+        rows.update(last_post_at=cls.latest_post('pub_date'),
+                    last_author=cls.latest_post('author_id'))
+
+    @classmethod
+    def rebuild(cls):
+        with transaction.atomic():
+            super().rebuild()
+            cls.refresh_last_posts()
+
+
+class Follow(models.Model):
+    """Подписка пользователя на автора.
+
+    pull - посты автора не раскладываются по лентам подписчиков при
+    записи, а читаются при показе ленты (posts.timeline): у автора
+    больше POSTS_TIMELINE_FANOUT_LIMIT подписчиков.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name='Подписчик',
+        # Поиск по user обслуживает индекс уникальности (user, author)
+        db_index=False
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Автор',
+        db_index=False
+    )
+    pull = models.BooleanField('Читать посты при показе ленты',
+                               default=False)
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        # Индекс (author, pull) - под выборку подписчиков при записи поста
+        indexes = [
+            models.Index(fields=['author', 'pull'],
+                         name='follow_author_pull_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='follow_unique'),
+            models.CheckConstraint(check=~models.Q(user=models.F('author')),
+                                   name='follow_not_self'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя.
+
+    Строки пишутся при создании поста (fan-out), а лента читается одним
+    диапазоном индекса (user, -pub_date, -post) - время чтения не
+    зависит от числа авторов, на которых подписан пользователь.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    # Копии полей поста: автор - чтобы при отписке удалить его посты из
+    # ленты, дата - для индекса ленты. Записи автора удаляются вместе с
+    # его постами, поэтому собственный CASCADE не нужен.
+    author = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        db_index=False
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+        # Автор в ограничении не меняет уникальности (пост однозначно
+        # задаёт автора), но индекс (user, author) нужен для отписки
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author', 'post'],
+                                    name='timeline_unique'),
+        ]
@@ -0,0 +1,203 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(post):
+    """Кодирует ключ (pub_date, id) поста в токен для URL."""
+    return encode_key(post.pub_date, post.pk)
+
+
+def encode_key(pub_date, pk):
+    raw = f'{pub_date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает пару (pub_date, id), закодированную в токене."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        pub_date, pk = raw.rsplit('|', 1)
+        pub_date = datetime.fromisoformat(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError) as error:
+        raise InvalidCursor(token) from error
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date, timezone.utc)
+    return pub_date, pk
+
+
+class ElidedPaginator(Paginator):
+    """Номерной паджинатор, который показывает не все номера страниц.
+
+    get_elided_page_range повторяет метод из Django 3.2: окно вокруг
+    текущей страницы, первые и последние страницы, а между ними
+    многоточие. Шаблон получает уже готовый короткий список и не
+    перебирает page_range целиком.
+    """
+    ELLIPSIS = '…'
+    on_each_side = 3
+    on_ends = 2
+
+    def get_elided_page_range(self, number=1, on_each_side=3, on_ends=2):
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def _get_page(self, *args, **kwargs):
+        return ElidedPage(*args, **kwargs)
+
+
+class ElidedPage(Page):
+    @property
+    def elided_page_range(self):
+        """Номера страниц для навигации вокруг текущей."""
+        paginator = self.paginator
+        return list(paginator.get_elided_page_range(
+            self.number, paginator.on_each_side, paginator.on_ends))
+
+
+class CursorPaginator(Paginator):
+    """Постраничная навигация по ключу (pub_date, id).
+
+    В отличие от обычного Paginator не выполняет ни COUNT(*), ни OFFSET:
+    каждая страница - это выборка per_page + 1 строк после (или до)
+    последнего увиденного поста, поэтому время ответа не зависит от
+    глубины страницы.
+
+    count, num_pages и номера страниц (CursorPage.number) всё же
+    доступны для кода, ожидающего обычный Paginator, но считаются
+    отдельным COUNT(*) при первом обращении; ленты их не используют.
+    """
+    is_keyset = True
+    ordering = ('-pub_date', '-pk')
+    # Поле, хранящее id поста (вторая часть ключа)
+    key_field = 'pk'
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def page_queryset(self, after=None, before=None):
+        """Запрос за одной страницей (с лишней строкой для has_next)."""
+        # Условие записано как диапазон по pub_date с исключением
+        # граничных строк, а не через OR: так SQLite ищет начало страницы
+        # по индексу, а не просматривает индекс с начала ленты.
+        limit = self.per_page + 1
+        if after is not None:
+            pub_date, pk = decode_cursor(after)
+            return self.object_list.filter(pub_date__lte=pub_date).exclude(
+                pub_date=pub_date, **{f'{self.key_field}__gte': pk})[:limit]
+        if before is not None:
+            pub_date, pk = decode_cursor(before)
+            return self.object_list.filter(pub_date__gte=pub_date).exclude(
+                pub_date=pub_date, **{f'{self.key_field}__lte': pk}
+            ).reverse()[:limit]
+        return self.object_list[:limit]
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу по токену; при битом токене - первую."""
+        try:
+            if after:
+                return self._after(after)
+            if before:
+                return self._before(before)
+        except InvalidCursor:
+            pass
+        return self._first()
+
+    def _first(self):
+        rows = list(self.page_queryset())
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self,
+                          has_previous=False, has_next=has_next)
+
+    def _after(self, token):
+        rows = list(self.page_queryset(after=token))
+        # Курсор за концом ленты - пустая страница, а не молча первая
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self,
+                          has_previous=True, has_next=has_next)
+
+    def _before(self, token):
+        rows = list(self.page_queryset(before=token))
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты - отдаём полную первую страницу,
+            # а не её обрезанный хвост.
+            return self._first()
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, self, has_previous=True, has_next=True)
+
+    def count_newer(self, pub_date, pk):
+        """Сколько объектов ленты стоят раньше ключа (pub_date, pk)."""
+        return self.object_list.filter(
+            Q(pub_date__gt=pub_date)
+            | Q(pub_date=pub_date, **{f'{self.key_field}__gt': pk})
+        ).count()
+
+
+class CursorPage(Page):
+    """Страница ленты, адресуемая токенами ?after= / ?before=."""
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        # Page.__init__ не вызывается: он присвоил бы number
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    @cached_property
+    def number(self):
+        """Номер страницы, как если бы лента делилась на страницы с
+        начала. У первой считается без запросов, у остальных - по
+        COUNT(*) постов новее первого на странице."""
+        if not self._has_previous:
+            return 1
+        if not self.object_list:
+            # За концом ленты
+            return self.paginator.num_pages + 1
+        first = self.object_list[0]
+        newer = self.paginator.count_newer(first.pub_date, first.pk)
+        return newer // self.paginator.per_page + 1
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self)
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return encode_cursor(self.object_list[0])
@@ -0,0 +1,34 @@
+import re
+from urllib.parse import urlencode
+
+from django.urls import reverse
+from django.utils.html import escape, linebreaks, urlize
+
+# Версия отрисовки: посты с другой text_html_version перерисовывает
+# команда render_posts_html. Увеличивается при любом изменении
+# render_text, меняющем результат.
+RENDERER_VERSION = 1
+
+# #тег не внутри слова, не в ссылке (/#якорь) и не в HTML-сущности
+# (&#39; после экранирования)
+HASHTAG_RE = re.compile(r'(?<![\w&#/])#(\w+)')
+# Ссылки, уже расставленные urlize: хештеги внутри них не размечаются
+LINK_RE = re.compile(r'(<a [^>]*>.*?</a>)', re.S)
+
+
+def hashtag_link(match):
+    tag = match.group(1)
+    url = reverse('posts:search') + '?' + urlencode({'q': tag})
+    return f'<a href="{escape(url)}" class="hashtag">#{escape(tag)}</a>'
+
+
+def render_text(text):
+    """Текст поста -> безопасный HTML: абзацы и переносы строк, ссылки
+    на адреса из текста и хештеги (поиск по тегу).
+
+    Текст экранируется целиком, теги в результате - только свои.
+    """
+    html = urlize(text, nofollow=True, autoescape=True)
+    parts = LINK_RE.split(html)
+    parts[::2] = [HASHTAG_RE.sub(hashtag_link, part) for part in parts[::2]]
+    return linebreaks(''.join(parts))
@@ -0,0 +1,113 @@
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+# Обычная (не external content) таблица FTS5: rowid совпадает с id поста,
+# текст хранится в ней самой, поэтому запись можно удалить по rowid, не
+# зная прежнего текста.
+FTS_TABLE = 'posts_post_fts'
+
+# Границы найденных слов в snippet(); заменяются на <mark> после
+# экранирования текста.
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 24
+
+WORD_RE = re.compile(r'\w+')
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+    """Запрос пользователя -> выражение MATCH для FTS5.
+
+    Каждое слово берётся в кавычки (служебные символы FTS5 в запросе
+    не ломают разбор) и ищется по префиксу: "пит"* найдёт "питон".
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query.lower()))
+
+
+def index_post(post):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text])
+
+
+def unindex_post(post_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def index_posts_after(post_id):
+    """Индексирует одним запросом все посты с id больше post_id -
+    для массовой загрузки, минующей сигналы."""
+    if not is_supported():
+        return
+    table = Post._meta.db_table
+    with connection.cursor() as cursor:
+        # Посты, созданные за это время через сайт, уже в индексе
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {table} WHERE id > %s AND id NOT IN '
+            f'(SELECT rowid FROM {FTS_TABLE} WHERE rowid > %s)',
+            [post_id, post_id])
+
+
+def rebuild_index():
+    """Заново заполняет поисковый индекс из таблицы постов."""
+    if not is_supported():
+        return 0
+    table = Post._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {table}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def search_posts(query):
+    """Посты, подходящие под запрос, от самых релевантных (bm25).
+
+    У каждого поста есть атрибут snippet - фрагмент текста с найденными
+    словами, размеченными MARK_START/MARK_END.
+    """
+    match = build_match(query)
+    posts = Post.objects.select_related('author', 'group')
+    if not match:
+        return posts.none()
+    table = Post._meta.db_table
+    if not is_supported():
+        return posts.filter(text__icontains=query).extra(
+            select={'snippet': f'{table}.text'})
+    return posts.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={
+            'rank': f'bm25({FTS_TABLE})',
+            'snippet': (f"snippet({FTS_TABLE}, 0, char(2), char(3), '…', "
+                        f'{SNIPPET_TOKENS})'),
+        },
+    ).order_by('rank', '-pub_date')
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и выделяет найденные слова тегом <mark>."""
+    html = escape(snippet)
+    return mark_safe(
+        html.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
@@ -0,0 +1,152 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .cache import GLOBAL_SCOPE, author_scope, bump_versions, group_scope
+from .lookups import AUTHORS, GROUPS
+from .models import AuthorStats, Follow, Group, GroupStats, Post, User
+from .search import index_post, unindex_post
+from .timeline import fan_out
+
+
+@receiver(post_init, sender=Post)
+def remember_post_relations(sender, instance, **kwargs):
+    """Запоминает исходную группу, чтобы заметить перенос поста."""
+    # Через __dict__, чтобы отложенное (.only/.defer) поле не
+    # подгружалось отдельным запросом.
+    instance._counted_group_id = instance.__dict__.get('group_id', DEFERRED)
+    instance._indexed_text = instance.__dict__.get('text', DEFERRED)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, raw=False, **kwargs):
+    """Сбрасывает кэш лент, в которых пост был или стал виден."""
+    # Подключён раньше счётчиков: им нужна ещё не обновлённая
+    # _counted_group_id, чтобы сбросить и ленту прежней группы.
+    if raw:
+        return
+    group_ids = {instance.group_id, instance._counted_group_id}
+    group_ids -= {None, DEFERRED}
+    slugs = []
+    if instance.group_id and Post.group.is_cached(instance):
+        # Группа из формы уже загружена - за её slug не ходим в базу
+        slugs.append(instance.group.slug)
+        group_ids.discard(instance.group_id)
+    if group_ids:
+        slugs.extend(Group.objects.filter(pk__in=group_ids).values_list(
+            'slug', flat=True))
+    bump_versions(
+        GLOBAL_SCOPE,
+        author_scope(instance.author.username),
+        *(group_scope(slug) for slug in slugs),
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        AuthorStats.add(instance.author_id, 1)
+        GroupStats.add_post(instance.group_id, instance)
+    elif instance._counted_group_id not in (DEFERRED, instance.group_id):
+        GroupStats.remove_post(instance._counted_group_id, instance)
+        GroupStats.add_post(instance.group_id, instance)
+    instance._counted_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    AuthorStats.add(instance.author_id, -1)
+    if instance._counted_group_id is not DEFERRED:
+        GroupStats.remove_post(instance._counted_group_id, instance)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, created, raw=False, **kwargs):
+    if not raw and (created or instance._indexed_text != instance.text):
+        index_post(instance)
+        instance._indexed_text = instance.text
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fan_out(instance)
+
+
+@receiver(post_init, sender=Group)
+@receiver(post_init, sender=User)
+def remember_feed_name(sender, instance, **kwargs):
+    """Запоминает slug/username, чтобы при переименовании сбросить кэш
+    и под старым адресом."""
+    field = 'slug' if sender is Group else 'username'
+    instance._feed_name = instance.__dict__.get(field)
+
+
+def group_authors(group):
+    """username авторов, у которых есть посты в group."""
+    return User.objects.filter(posts__group=group).values_list(
+        'username', flat=True).distinct()
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    # К post_delete у постов группы уже стоит group = NULL
+    instance._feed_authors = list(group_authors(instance))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, raw=False, created=False,
+                           **kwargs):
+    if raw:
+        return
+    # Название и адрес группы выводятся и в общей ленте, и в профилях
+    # авторов, писавших в неё
+    usernames = []
+    if kwargs['signal'] is post_delete:
+        usernames = instance._feed_authors
+    elif not created:
+        usernames = group_authors(instance)
+    bump_versions(GLOBAL_SCOPE, group_scope(instance.slug),
+                  group_scope(instance._feed_name),
+                  *(author_scope(username) for username in usernames))
+    GROUPS.delete(instance.slug, instance._feed_name)
+    instance._feed_name = instance.slug
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author_feeds(sender, instance, raw=False, update_fields=None,
+                            created=False, **kwargs):
+    # Вход пользователя обновляет только last_login - ленты не меняются
+    if raw or update_fields == frozenset({'last_login'}):
+        return
+    # Имя и username автора выводятся и в лентах групп, где он писал.
+    # При удалении пользователя их сбрасывают сигналы удаления постов.
+    slugs = []
+    if kwargs['signal'] is post_save and not created:
+        slugs = Group.objects.filter(posts__author=instance).values_list(
+            'slug', flat=True).distinct()
+    bump_versions(GLOBAL_SCOPE, author_scope(instance.username),
+                  author_scope(instance._feed_name),
+                  *(group_scope(slug) for slug in slugs))
+    AUTHORS.delete(instance.username, instance._feed_name)
+    instance._feed_name = instance.username
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_followed_profile(sender, instance, raw=False, **kwargs):
+    # Кнопка подписки на странице автора входит в её ETag только через
+    # версию ленты автора
+    if not raw:
+        bump_versions(author_scope(instance.author.username))
@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api-author')
+        cls.group = Group.objects.create(title='Группа', slug='api-group')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author,
+                 group=cls.group if i % 2 else None)
+            for i in range(25))
+        cls.post = Post.objects.latest('pub_date', 'pk')
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсоры из next проходят ленту без пропусков и повторов."""
+        url = reverse('posts:api_posts') + '?limit=10'
+        ids = []
+        with self.assertNumQueries(1):
+            data = self.client.get(url).json()
+        while True:
+            ids.extend(row['id'] for row in data['results'])
+            if not data['next']:
+                break
+            data = self.client.get(data['next']).json()
+        self.assertEqual(ids, list(Post.objects.order_by(
+            '-pub_date', '-pk').values_list('pk', flat=True)))
+
+    def test_sparse_fields(self):
+        data = self.client.get(reverse('posts:api_posts'),
+                               {'fields': 'id,author'}).json()
+        self.assertEqual(data['results'][0],
+                         {'id': self.post.pk, 'author': 'api-author'})
+        response = self.client.get(reverse('posts:api_posts'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_group_and_profile_feeds(self):
+        urls = {
+            reverse('posts:api_group_posts', args=[self.group.slug]): 12,
+            reverse('posts:api_profile_posts',
+                    args=[self.author.username]): 20,
+        }
+        for url, count in urls.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(2):
+                    data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), count)
+        response = self.client.get(
+            reverse('posts:api_group_posts', args=['unknown']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_etag(self):
+        url = reverse('posts:api_posts')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='Новый', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail(self):
+        url = reverse('posts:api_post', args=[self.post.pk])
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['text'], self.post.text)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            reverse('posts:api_post', args=[self.post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_bad_cursor(self):
+        response = self.client.get(reverse('posts:api_posts'),
+                                   {'after': 'не-курсор'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_profile_etag_follows_group_change(self):
+        """В постах профиля есть slug группы: после его смены старый ETag
+        не даёт 304."""
+        url = reverse('posts:api_profile_posts', args=[self.author.username])
+        etag = self.client.get(url)['ETag']
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'api-renamed'
+        group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {row['group'] for row in response.json()['results']},
+            {None, 'api-renamed'})
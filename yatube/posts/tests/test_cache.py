@@ -0,0 +1,261 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..cache import GLOBAL_SCOPE, feed_cache_stats, get_version, page_keys
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cached')
+        cls.group = Group.objects.create(title='Группа', slug='cached')
+        cls.other_group = Group.objects.create(title='Другая', slug='other')
+        cls.post = Post.objects.create(
+            text='Первый пост', author=cls.user, group=cls.group)
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_hit_skips_database(self):
+        """Повторный запрос гостя отдаётся из кэша без запросов к базе."""
+        # Метрики общие для всего процесса - считаем прирост
+        hits = feed_cache_stats()['hits']
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+        self.assertEqual(feed_cache_stats()['hits'] - hits, len(self.urls))
+
+    def test_new_post_invalidates_feeds(self):
+        """Новый пост сразу виден во всех своих лентах."""
+        for url in self.urls:
+            self.guest_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Свежий пост', 'group': self.group.pk})
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Свежий пост')
+
+    def test_moved_post_leaves_old_group_feed(self):
+        """Перенос поста в другую группу сбрасывает ленты обеих групп."""
+        old_url = reverse('posts:group_list', args=[self.group.slug])
+        new_url = reverse('posts:group_list', args=[self.other_group.slug])
+        self.guest_client.get(old_url)
+        self.guest_client.get(new_url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[self.post.pk]),
+            {'text': 'Первый пост', 'group': self.other_group.pk})
+        self.assertNotContains(self.guest_client.get(old_url), 'Первый пост')
+        self.assertContains(self.guest_client.get(new_url), 'Первый пост')
+
+    def test_renamed_author_invalidates_group_feeds(self):
+        """Имя автора в лентах групп, где он писал, меняется сразу."""
+        url = reverse('posts:group_list', args=[self.group.slug])
+        api_url = reverse('posts:api_group_posts', args=[self.group.slug])
+        self.guest_client.get(url)
+        etag = self.guest_client.get(api_url)['ETag']
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name, user.last_name = 'Новое', 'Имя'
+        user.save()
+        self.assertContains(self.guest_client.get(url), 'Новое Имя')
+        self.assertEqual(self.guest_client.get(
+            api_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_renamed_group_invalidates_author_profiles(self):
+        """Название и адрес группы в профилях её авторов меняются сразу."""
+        url = reverse('posts:profile', args=[self.user.username])
+        self.assertContains(self.guest_client.get(url), 'Группа')
+        group = Group.objects.get(pk=self.group.pk)
+        group.title, group.slug = 'Переименована', 'renamed'
+        group.save()
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Переименована')
+        self.assertContains(response, reverse(
+            'posts:group_list', args=['renamed']))
+        self.assertNotContains(response, reverse(
+            'posts:group_list', args=['cached']))
+        group.delete()
+        self.assertNotContains(self.guest_client.get(url), 'Переименована')
+
+    def test_versions_bumped_again_after_commit(self):
+        """Страница, сохранённая под новой версией до фиксации записи,
+        сбрасывается после неё."""
+        with mock.patch('posts.cache.transaction.on_commit') as on_commit:
+            Post.objects.create(text='Пост', author=self.user)
+        in_transaction = get_version(GLOBAL_SCOPE)
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertGreater(get_version(GLOBAL_SCOPE), in_transaction)
+
+    def test_authorized_user_bypasses_cache(self):
+        """Авторизованному пользователю страница не отдаётся из кэша."""
+        self.authorized_client.get(self.urls[0])
+        response = self.authorized_client.get(self.urls[0])
+        self.assertIn('page_obj', response.context)
+
+    def test_post_and_about_pages_cached(self):
+        urls = [
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('about:author'),
+            reverse('about:tech'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.context)
+
+    def test_stats_command_needs_metrics_dir(self):
+        with self.assertRaisesMessage(CommandError, 'METRICS_DIR'):
+            call_command('feed_cache_stats', stdout=StringIO())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        out = StringIO()
+        with override_settings(METRICS_DIR=directory):
+            call_command('feed_cache_stats', stdout=out)
+        self.assertIn('доля попаданий', out.getvalue())
+
+    def test_key_varies_on_query(self):
+        url = reverse('posts:search')
+        self.assertContains(
+            self.guest_client.get(url, {'q': 'Первый'}), 'Первый')
+        self.assertNotContains(
+            self.guest_client.get(url, {'q': 'Второй'}), 'Первый')
+
+    def test_stale_copy_served_while_regenerating(self):
+        """Пока страницу пересобирает другой запрос, гость получает
+        прежнюю копию, а не запускает пересборку сам."""
+        url = self.urls[0]
+        self.guest_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Свежий пост'})
+        _, lock_key = page_keys(url)
+        cache.add(lock_key, 1)
+        stale = feed_cache_stats()['stale']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertNotContains(response, 'Свежий пост')
+        self.assertEqual(feed_cache_stats()['stale'] - stale, 1)
+        cache.delete(lock_key)
+        self.assertContains(self.guest_client.get(url), 'Свежий пост')
+        # Пересобравший страницу запрос снимает блокировку
+        self.assertTrue(cache.add(lock_key, 1))
+
+
+class FileBasedFeedCacheTest(FeedCacheTest):
+    """Те же проверки на файловом кэше, общем для процессов."""
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.cache_settings = override_settings(CACHES={
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': cls.cache_dir,
+            }
+        })
+        cls.cache_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.cache_settings.disable()
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='conditional')
+        cls.group = Group.objects.create(title='Группа', slug='conditional')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.user, group=cls.group)
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_repeat_visit_gets_not_modified(self):
+        """С совпавшим ETag страница отдаётся как 304 без рендеринга."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        response = self.guest_client.get(self.urls[0])
+        response = self.guest_client.get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_edit_changes_validators(self):
+        """Редактирование поста меняет ETag во всех его лентах."""
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[self.post.pk]),
+            {'text': 'Исправленный пост', 'group': self.group.pk})
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_differs_between_users(self):
+        """Гость и автор видят разные шапки - и ETag у них разный."""
+        guest = self.guest_client.get(self.urls[0])
+        response = self.authorized_client.get(
+            self.urls[0], HTTP_IF_NONE_MATCH=guest['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_new_csrf_token_changes_etag(self):
+        """Страница с формой подписки после смены CSRF-токена (повторный
+        вход) отдаётся заново, а не как 304 со старым токеном."""
+        self.authorized_client.force_login(
+            User.objects.create_user(username='reader'))
+        url = reverse('posts:profile', args=[self.user.username])
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.authorized_client.cookies['csrftoken'] = 'x' * 64
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase
+
+from ..management.commands.explain_feeds import plan_problems
+from ..models import AuthorStats, Group, GroupStats, Post
+from ..rendering import RENDERER_VERSION
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feeds_use_indexes(self):
+        """Запросы лент не просматривают таблицы целиком."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        self.assertIn('по индексам', out.getvalue())
+
+    def test_plan_problems(self):
+        """Полный просмотр и сортировка во временном B-tree замечаются."""
+        plan = ('2 0 0 SCAN posts_post\n'
+                '9 0 0 USE TEMP B-TREE FOR ORDER BY')
+        self.assertEqual(len(plan_problems(plan)), 2)
+        self.assertEqual(plan_problems(
+            '2 0 0 SCAN posts_post USING INDEX post_pub_date_idx'), [])
+        self.assertEqual(len(plan_problems(
+            '2 0 0 SCAN posts_post USING INDEX post_pub_date_idx',
+            keyset=True)), 1)
+
+
+class ImportPostsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='importer')
+        cls.group = Group.objects.create(title='Группа', slug='imported')
+        cls.tmp_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_posts(self, *args):
+        err = StringIO()
+        call_command('import_posts', *args, stdout=StringIO(), stderr=err)
+        return err.getvalue()
+
+    def test_import_jsonl(self):
+        """Посты загружаются пачками с датами из файла, а счётчики и
+        поисковый индекс обновляются в конце."""
+        rows = [
+            {'text': f'Импортированный пост {i}', 'author': 'importer',
+             'group': 'imported', 'pub_date': f'2020-01-{i + 1:02d}T10:00:00'}
+            for i in range(5)
+        ]
+        path = self.write('posts.jsonl', '\n'.join(map(json.dumps, rows)))
+        self.import_posts(path, '--batch-size', '2')
+        posts = Post.objects.filter(author=self.user)
+        self.assertEqual(posts.count(), 5)
+        self.assertEqual(posts.last().pub_date.date(), date(2020, 1, 1))
+        self.assertEqual(AuthorStats.objects.get(pk=self.user.pk).posts_count,
+                         5)
+        stats = GroupStats.objects.get(pk=self.group.pk)
+        self.assertEqual(stats.posts_count, 5)
+        self.assertEqual(stats.last_post_at.date(), date(2020, 1, 5))
+        self.assertEqual(len(search_posts('импортированный')), 5)
+
+    def test_import_csv_skips_bad_rows(self):
+        """Строки с неизвестным автором или битой датой пропускаются."""
+        path = self.write('posts.csv', (
+            'text,author,group,pub_date\n'
+            'Хороший пост,importer,,\n'
+            'Чужой пост,nobody,,\n'
+            'Пост с датой,importer,imported,вчера\n'
+        ))
+        errors = self.import_posts(path)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertIn('nobody', errors)
+        self.assertIsNone(Post.objects.get().group)
+
+    def test_non_string_fields_skipped(self):
+        """Список или объект вместо имени - пропуск строки, а не падение
+        загрузки."""
+        rows = [
+            {'text': 'Пост', 'author': ['importer']},
+            {'text': 'Пост', 'author': 'importer', 'group': {'slug': 'x'}},
+            {'text': 'Хороший пост', 'author': 'importer'},
+        ]
+        path = self.write('typed.jsonl', '\n'.join(map(json.dumps, rows)))
+        errors = self.import_posts(path, '--create-missing')
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertIn('Строка 1: поле author', errors)
+        self.assertIn('Строка 2: поле group', errors)
+
+    def test_model_field_untouched(self):
+        """Даты из файла сохраняются без правки auto_now_add у модели."""
+        field = Post._meta.get_field('pub_date')
+        seen = []
+        bulk_create = QuerySet.bulk_create
+
+        def checked(queryset, objs, *args, **kwargs):
+            seen.append(field.auto_now_add)
+            return bulk_create(queryset, objs, *args, **kwargs)
+
+        path = self.write('dated.jsonl', json.dumps({
+            'text': 'Пост', 'author': 'importer',
+            'pub_date': '2020-01-01T10:00:00'}))
+        with mock.patch.object(QuerySet, 'bulk_create', checked):
+            self.import_posts(path)
+        self.assertEqual(seen, [True])
+        self.assertEqual(Post.objects.get().pub_date.date(), date(2020, 1, 1))
+
+    def test_create_missing(self):
+        path = self.write('new.jsonl', json.dumps(
+            {'text': 'Пост', 'author': 'newcomer', 'group': 'new-group'}))
+        self.import_posts(path, '--create-missing')
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertEqual(post.group.slug, 'new-group')
+
+
+class ExportPostsCommandTest(TestCase):
+    def test_export_import_round_trip(self):
+        """Выгрузку можно загрузить обратно через import_posts."""
+        user = User.objects.create_user(username='exporter')
+        Post.objects.create(text='Пост для выгрузки', author=user)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        path = os.path.join(tmp_dir, 'posts.csv')
+        call_command('export_posts', '--format', 'csv', '-o', path)
+        Post.objects.all().delete()
+        call_command('import_posts', path, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual((post.text, post.author), ('Пост для выгрузки', user))
+
+
+class RenderPostsHtmlCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='renderer')
+        Post.objects.bulk_create(
+            Post(text=f'Пост #{i}', author=self.user) for i in range(5))
+
+    def test_renders_stale_posts_in_batches(self):
+        out = StringIO()
+        call_command('render_posts_html', '--batch-size', '2', stdout=out)
+        self.assertIn('Перерисовано постов: 4', out.getvalue())
+        self.assertFalse(Post.objects.exclude(
+            text_html_version=RENDERER_VERSION).exists())
+        self.assertIn('class="hashtag"', Post.objects.first().text_html)
+        out = StringIO()
+        call_command('render_posts_html', stdout=out)
+        self.assertIn('перерисовано 0', out.getvalue())
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class SyndicationFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feeds', description='Описание группы')
+        cls.post = Post.objects.create(
+            text='Пост для читателей лент', author=cls.user, group=cls.group)
+        cls.urls = [
+            reverse('posts:index_rss'),
+            reverse('posts:index_atom'),
+            reverse('posts:group_rss', args=[cls.group.slug]),
+            reverse('posts:group_atom', args=[cls.group.slug]),
+            reverse('posts:profile_rss', args=[cls.user.username]),
+            reverse('posts:profile_atom', args=[cls.user.username]),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_feeds_list_posts(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Пост для читателей лент')
+                kind = 'atom' if url.endswith('atom/') else 'rss'
+                self.assertIn(kind, response['Content-Type'])
+
+    def test_feed_cached_until_post_written(self):
+        """Лента отрисовывается раз на версию и отдаётся из кэша до
+        записи поста."""
+        url = self.urls[2]
+        self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            self.guest_client.get(url)
+        Post.objects.create(text='Новый пост', author=self.user,
+                            group=self.group)
+        self.assertContains(self.guest_client.get(url), 'Новый пост')
+
+    def test_profile_feeds_follow_group_rename(self):
+        """Лента автора хранится до новой версии, поэтому переименование
+        группы должно её сбрасывать: в записях - категория группы."""
+        for url in self.urls[4:]:
+            self.guest_client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Переименована'
+        group.save()
+        for url in self.urls[4:]:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url),
+                                    'Переименована')
+
+    def test_conditional_get(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    not_modified = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                not_modified = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_unknown_group(self):
+        response = self.guest_client.get(
+            reverse('posts:group_rss', args=['unknown']))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,73 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..cache import VERSION_KEY, group_scope
+from ..lookups import AUTHORS, GROUPS
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class LookupCacheTest(TestCase):
+    def setUp(self):
+        GROUPS.clear()
+        AUTHORS.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.group = Group.objects.create(title='Группа', slug='cached')
+        self.client.force_login(self.author)
+
+    def test_group_and_author_read_once(self):
+        for url, query in (
+                (reverse('posts:group_list', args=['cached']),
+                 'FROM "posts_group" WHERE "posts_group"."slug"'),
+                (reverse('posts:profile', args=['writer']),
+                 'WHERE "auth_user"."username"')):
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(1) as context:
+                    self.client.get(url, {'page': 1})
+                self.assertFalse(any(query in item['sql']
+                                     for item in context.captured_queries))
+        self.assertEqual(GROUPS.stats()['hits'], 1)
+        self.assertEqual(AUTHORS.stats()['hits'], 1)
+
+    def test_missing_cached_until_created(self):
+        url = reverse('posts:group_list', args=['new'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        Group.objects.create(title='Новая', slug='new')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_missing_leaves_no_permanent_keys(self):
+        """Перебор несуществующих адресов не копит вечные ключи в общем
+        кэше."""
+        cache.clear()
+        self.client.get(reverse('posts:group_list', args=['probe']))
+        key = VERSION_KEY.format(scope=group_scope('probe'))
+        self.assertIsNotNone(cache.get(key))
+        later = time.time() + settings.POSTS_FEED_VERSION_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertIsNone(cache.get(key))
+
+    def test_invalidated_on_change(self):
+        url = reverse('posts:profile', args=['writer'])
+        self.client.get(url)
+        # Число постов автора в профиле меняется вместе с версией ленты
+        Post.objects.create(text='Пост', author=self.author)
+        self.assertEqual(self.client.get(url).context[
+            'author'].post_stats.posts_count, 1)
+        self.group.title = 'Переименована'
+        self.group.save()
+        response = self.client.get(
+            reverse('posts:group_list', args=['cached']))
+        self.assertEqual(response.context['group'].title, 'Переименована')
+        self.group.delete()
+        self.assertEqual(self.client.get(
+            reverse('posts:group_list', args=['cached'])).status_code, 404)
@@ -1,7 +1,11 @@
+from datetime import timedelta
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStats, Group, GroupStats, Post
 
 User = get_user_model()
 
@@ -56,3 +60,106 @@ class ModelTest(TestCase):
         for model, expected_value in expected_object_name.items():
             with self.subTest(model=model):
                 self.assertEqual(str(model), expected_value)
+
+
+class PostsCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(title='Первая', slug='first')
+        cls.group2 = Group.objects.create(title='Вторая', slug='second')
+
+    def assertCounts(self, author, group, group2):
+        self.assertEqual(
+            AuthorStats.objects.get(pk=self.user.pk).posts_count, author)
+        for group, expected in ((self.group, group), (self.group2, group2)):
+            stats = GroupStats.objects.filter(pk=group.pk).first()
+            self.assertEqual(stats.posts_count if stats else 0, expected)
+
+    def test_counters_follow_post_writes(self):
+        """Счётчики меняются при создании, переносе и удалении поста."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, group=self.group)
+        Post.objects.create(text='Без группы', author=self.user)
+        self.assertCounts(2, 1, 0)
+        post.group = self.group2
+        post.save()
+        self.assertCounts(2, 0, 1)
+        Post.objects.get(pk=post.pk).delete()
+        self.assertCounts(1, 0, 0)
+
+    def test_rebuild_counters_command(self):
+        """rebuild_counters восстанавливает разъехавшиеся счётчики."""
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        AuthorStats.objects.update(posts_count=100)
+        GroupStats.objects.all().delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCounts(1, 1, 0)
+        self.assertEqual(GroupStats.objects.get(pk=self.group.pk).last_author,
+                         self.user)
+
+
+class GroupLastPostTest(TestCase):
+    """Последний пост группы в GroupStats следует за записями постов."""
+    def setUp(self):
+        self.first = User.objects.create_user(username='first')
+        self.second = User.objects.create_user(username='second')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.other = Group.objects.create(title='Другая', slug='other')
+
+    def last_post(self, group):
+        stats = GroupStats.objects.get(pk=group.pk)
+        return stats.last_post_at, stats.last_author
+
+    def test_new_post_becomes_last(self):
+        Post.objects.create(text='Первый', author=self.first, group=self.group)
+        post = Post.objects.create(
+            text='Второй', author=self.second, group=self.group)
+        self.assertEqual(self.last_post(self.group),
+                         (post.pub_date, self.second))
+
+    def test_delete_and_move_find_previous_post(self):
+        older = Post.objects.create(
+            text='Первый', author=self.first, group=self.group)
+        post = Post.objects.create(
+            text='Второй', author=self.second, group=self.group)
+        post.group = self.other
+        post.save()
+        self.assertEqual(self.last_post(self.group),
+                         (older.pub_date, self.first))
+        self.assertEqual(self.last_post(self.other),
+                         (post.pub_date, self.second))
+        post.delete()
+        self.assertEqual(self.last_post(self.other), (None, None))
+        self.assertEqual(
+            GroupStats.objects.get(pk=self.other.pk).posts_count, 0)
+
+    def test_older_post_does_not_replace_last(self):
+        post = Post.objects.create(
+            text='Новый', author=self.first, group=self.group)
+        older = Post.objects.create(text='Старый', author=self.second)
+        Post.objects.filter(pk=older.pk).update(
+            pub_date=post.pub_date - timedelta(days=1))
+        older = Post.objects.get(pk=older.pk)
+        older.group = self.group
+        older.save()
+        self.assertEqual(self.last_post(self.group),
+                         (post.pub_date, self.first))
+
+    def test_deleted_group_leaves_posts_without_stats(self):
+        """SET_NULL при удалении группы: строка статистики уходит
+        каскадом, у остальных групп ничего не меняется."""
+        Post.objects.create(text='Пост', author=self.first, group=self.group)
+        Post.objects.create(text='Пост', author=self.second, group=self.other)
+        self.group.delete()
+        self.assertFalse(GroupStats.objects.filter(pk=self.group.pk).exists())
+        self.assertEqual(Post.objects.filter(group__isnull=True).count(), 1)
+        self.assertEqual(self.last_post(self.other)[1], self.second)
+
+    def test_deleted_author_replaced_by_previous(self):
+        Post.objects.create(text='Первый', author=self.first, group=self.group)
+        Post.objects.create(
+            text='Второй', author=self.second, group=self.group)
+        self.second.delete()
+        self.assertEqual(self.last_post(self.group)[1], self.first)
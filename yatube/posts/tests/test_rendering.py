@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..rendering import RENDERER_VERSION, render_text
+
+User = get_user_model()
+
+
+class RenderTextTest(TestCase):
+    def test_escapes_text(self):
+        self.assertEqual(render_text('<script>"x"</script>'),
+                         '<p>&lt;script&gt;&quot;x&quot;&lt;/script&gt;</p>')
+
+    def test_paragraphs_and_line_breaks(self):
+        self.assertEqual(render_text('Раз\nдва\n\nтри'),
+                         '<p>Раз<br>два</p>\n\n<p>три</p>')
+
+    def test_links_and_hashtags(self):
+        html = render_text('Смотри https://example.com/#top про #django '
+                           "и не тег: it's")
+        self.assertIn('<a href="https://example.com/#top" rel="nofollow">',
+                      html)
+        self.assertIn(
+            f'<a href="{reverse("posts:search")}?q=django" '
+            f'class="hashtag">#django</a>', html)
+        # Ни якорь ссылки, ни &#39; не стали хештегами
+        self.assertEqual(html.count('class="hashtag"'), 1)
+
+
+class PostHtmlTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+
+    def test_html_stored_on_save(self):
+        post = Post.objects.create(text='Первый\nпост', author=self.user)
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.text_html, '<p>Первый<br>пост</p>')
+        self.assertEqual(post.text_html_version, RENDERER_VERSION)
+        post.text = 'Новый'
+        post.save(update_fields=['text'])
+        self.assertEqual(Post.objects.get(pk=post.pk).text_html,
+                         '<p>Новый</p>')
+
+    def test_edit_form_rerenders(self):
+        post = Post.objects.create(text='Старый', author=self.user)
+        self.client.force_login(self.user)
+        self.client.post(reverse('posts:post_edit', args=[post.pk]),
+                         {'text': 'Про #python'})
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, 'class="hashtag">#python</a>')
+
+    def test_stale_version_rendered_on_the_fly(self):
+        Post.objects.bulk_create([Post(text='Без HTML', author=self.user)])
+        post = Post.objects.get()
+        self.assertEqual(post.text_html, '')
+        self.assertEqual(post.html, '<p>Без HTML</p>')
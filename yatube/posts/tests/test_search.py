@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import FTS_TABLE, search_posts
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.python = Post.objects.create(
+            text='Питон - язык программирования. Питон везде.',
+            author=cls.user)
+        cls.mention = Post.objects.create(
+            text='Сегодня читал про языки, упомянули питон <b>один раз</b>.',
+            author=cls.user)
+        Post.objects.create(text='Совсем другой пост', author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_results_ranked_by_relevance(self):
+        """Пост, где слово встречается чаще, выше в выдаче."""
+        self.assertEqual(list(search_posts('питон')),
+                         [self.python, self.mention])
+
+    def test_prefix_query(self):
+        """Слово ищется по префиксу."""
+        self.assertEqual(len(search_posts('прог')), 1)
+
+    def test_special_characters_are_not_syntax(self):
+        """Служебные символы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(len(search_posts('"питон" -(язык*')), 2)
+        self.assertFalse(search_posts('***').exists())
+
+    def test_search_page_highlights_snippet(self):
+        """Страница поиска выделяет слова и экранирует текст поста."""
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': 'упомянули'})
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertContains(response, '<mark>упомянули</mark>')
+        self.assertContains(response, '&lt;b&gt;один')
+
+    def test_index_follows_post_writes(self):
+        """Изменение и удаление поста сразу отражаются в индексе."""
+        post = Post.objects.create(text='Уникальнослово', author=self.user)
+        self.assertEqual(list(search_posts('уникальнослово')), [post])
+        post.text = 'Переписанный текст'
+        post.save()
+        self.assertFalse(search_posts('уникальнослово').exists())
+        post.delete()
+        self.assertFalse(search_posts('переписанный').exists())
+
+    def test_rebuild_search_index_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.assertFalse(search_posts('питон').exists())
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(search_posts('питон')), 2)
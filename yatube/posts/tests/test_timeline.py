@@ -0,0 +1,127 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import fan_out_after, follow
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'writer{i}')
+                       for i in range(3)]
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def feed(self, **params):
+        response = self.client.get(reverse('posts:follow_index'), params)
+        return response.context['page_obj']
+
+    def test_follow_and_unfollow(self):
+        old = Post.objects.create(text='Старый пост', author=self.authors[0])
+        response = self.client.post(
+            reverse('posts:profile_follow', args=[self.authors[0].username]))
+        self.assertRedirects(
+            response, reverse('posts:profile', args=[self.authors[0]]))
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.authors[0]).exists())
+        # Последние посты автора попадают в ленту сразу при подписке
+        self.assertEqual(list(self.feed()), [old])
+        self.client.post(reverse('posts:profile_unfollow',
+                                 args=[self.authors[0].username]))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(list(self.feed()), [])
+
+    def test_follow_requires_post_and_not_self(self):
+        url = reverse('posts:profile_follow', args=[self.reader.username])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.client.post(url)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_new_post_pushed_to_followers(self):
+        follow(self.reader, self.authors[0])
+        post = Post.objects.create(text='Новый пост', author=self.authors[0])
+        Post.objects.create(text='Чужой пост', author=self.authors[1])
+        self.assertEqual(list(self.feed()), [post])
+
+    def test_reads_do_not_depend_on_followed_authors(self):
+        for author in self.authors:
+            follow(self.reader, author)
+            Post.objects.bulk_create(
+                Post(text=f'Пост {i}', author=author) for i in range(5))
+        fan_out_after(0)
+        self.feed()
+        # Сессия и пользователь уже в кэше: авторы с pull и одна выборка
+        # ленты
+        with self.assertNumQueries(2):
+            page = self.feed()
+        self.assertEqual(len(page), 10)
+        self.assertEqual(list(page), list(Post.objects.all()[:10]))
+        rest = self.feed(after=page.next_cursor)
+        self.assertEqual(list(rest), list(Post.objects.all()[10:]))
+        self.assertFalse(rest.has_next())
+
+    @override_settings(POSTS_TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_pulled_on_read(self):
+        """Посты автора с подписчиками сверх лимита не раскладываются по
+        лентам, а читаются при показе - без повторов."""
+        other = User.objects.create_user(username='other')
+        author = self.authors[0]
+        follow(self.reader, author)
+        follow(other, author)
+        follow(self.reader, self.authors[1])
+        first = Post.objects.create(text='Первый', author=author)
+        self.assertTrue(all(Follow.objects.filter(
+            author=author).values_list('pull', flat=True)))
+        self.assertFalse(TimelineEntry.objects.filter(post=first).exists())
+        posts = [Post.objects.create(text=f'Пост {i}', author=author)
+                 for i in range(10)]
+        pushed = Post.objects.create(text='Обычный', author=self.authors[1])
+        page = self.feed()
+        self.assertEqual(list(page), [pushed] + posts[::-1][:9])
+        rest = self.feed(after=page.next_cursor)
+        self.assertEqual(list(rest), [posts[0], first])
+        back = self.feed(before=rest.previous_cursor)
+        self.assertEqual(list(back), list(page))
+        # Обычный API Page: посты с pull = True и из ленты без повторов
+        self.assertEqual(rest.paginator.count, 12)
+        self.assertEqual(rest.number, 2)
+        self.assertEqual(rest.previous_page_number(), 1)
+
+    @override_settings(POSTS_TIMELINE_FANOUT_LIMIT=0)
+    def test_several_pulled_authors_merged(self):
+        """Посты нескольких авторов с pull = True читаются одним запросом
+        и сливаются в общий порядок ленты."""
+        for author in self.authors:
+            follow(self.reader, author)
+        for i in range(8):
+            for author in self.authors:
+                Post.objects.create(text=f'Пост {i}', author=author)
+        self.assertTrue(all(Follow.objects.values_list('pull', flat=True)))
+        self.feed()
+        with self.assertNumQueries(3):
+            page = self.feed()
+        seen = list(page)
+        while page.has_next():
+            page = self.feed(after=page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, list(Post.objects.order_by('-pub_date', '-pk')))
+
+    def test_rebuild_command(self):
+        follow(self.reader, self.authors[0])
+        post = Post.objects.create(text='Пост', author=self.authors[0])
+        TimelineEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_timelines', self.reader.username, stdout=out)
+        self.assertIn('записей: 1', out.getvalue())
+        self.assertEqual(list(self.feed()), [post])
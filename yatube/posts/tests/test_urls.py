@@ -1,5 +1,6 @@
 # posts/tests/test_urls.py
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase, Client
 
 from ..models import Group, Post
@@ -27,6 +28,8 @@ class PostsURLTestCase(TestCase):
         )
 
     def setUp(self):
+        # Гостю страницы отдаются из кэша, без рендеринга шаблонов
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client1 = Client()
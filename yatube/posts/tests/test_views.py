@@ -1,7 +1,15 @@
+import csv
+import gzip
+import json
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from ..models import Group, Post
+from ..paginators import ElidedPaginator, encode_cursor
 
 User = get_user_model()
 
@@ -97,6 +105,10 @@ class PaginatorViewsTest(TestCase):
                                   author=cls.author))
         Post.objects.bulk_create(bilk_post)
 
+    def setUp(self):
+        # bulk_create не шлёт сигналов, сбрасывающих кэш лент
+        cache.clear()
+
     def test_page_contains_ten_records(self):
         reverse_names = [
             reverse('posts:index'),
@@ -111,3 +123,243 @@ class PaginatorViewsTest(TestCase):
                 # Проверка: количество постов на второй странице равно 3.
                 response = self.guest_client.get((reverse_name) + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pages(self):
+        """Курсорная лента листается токенами ?after= и ?before=."""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.guest_client.get(
+            url, {'after': first.next_cursor}).context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertFalse(set(first) & set(second))
+        back = self.guest_client.get(
+            url, {'before': second.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_cursor_page_supports_page_api(self):
+        """Код, ожидающий обычный Page, получает номера страниц."""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        self.assertEqual(first.number, 1)
+        self.assertEqual(first.next_page_number(), 2)
+        second = self.guest_client.get(
+            url, {'after': first.next_cursor}).context['page_obj']
+        self.assertEqual(second.paginator.count, 13)
+        self.assertEqual(second.paginator.num_pages, 2)
+        self.assertEqual(second.number, 2)
+        self.assertEqual(second.previous_page_number(), 1)
+
+    def test_cursor_past_end_returns_empty_page(self):
+        url = reverse('posts:index')
+        last = Post.objects.order_by('pub_date', 'pk').first()
+        response = self.guest_client.get(
+            url, {'after': encode_cursor(last)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertFalse(response.context['page_obj'].has_other_pages())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый токен не ломает страницу, а отдаёт начало ленты."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': 'не-токен'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_elided_page_range(self):
+        """Ссылки только на окно вокруг текущей страницы и края ленты."""
+        paginator = ElidedPaginator(range(1000), 10)
+        ellipsis = paginator.ELLIPSIS
+        cases = {
+            1: [1, 2, 3, 4, ellipsis, 99, 100],
+            50: [1, 2, ellipsis, 47, 48, 49, 50, 51, 52, 53, ellipsis,
+                 99, 100],
+            100: [1, 2, ellipsis, 97, 98, 99, 100],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                page = paginator.page(number)
+                self.assertEqual(page.elided_page_range, expected)
+        self.assertEqual(ElidedPaginator(range(50), 10).page(3)
+                         .elided_page_range, [1, 2, 3, 4, 5])
+
+    def test_page_links_elided(self):
+        response = self.guest_client.get(reverse('posts:index'), {'page': 1})
+        self.assertEqual(response.context['page_obj'].elided_page_range,
+                         [1, 2])
+        self.assertContains(response, '?page=2')
+
+
+class FeedFragmentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='scroller')
+        cls.group = Group.objects.create(title='Группа', slug='scroll')
+        Post.objects.bulk_create(
+            Post(text=f'Пост ленты {i}', author=cls.author, group=cls.group)
+            for i in range(15))
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fragment_by_header_and_param(self):
+        """Фрагмент - только посты и навигация, без base.html."""
+        for url in self.urls:
+            for params, headers in (({}, {'HTTP_X_FRAGMENT': '1'}),
+                                    ({'fragment': 1}, {})):
+                with self.subTest(url=url, params=params):
+                    response = self.client.get(url, params, **headers)
+                    self.assertNotContains(response, '<html')
+                    self.assertContains(response, 'Пост ленты', count=10)
+                    self.assertTemplateUsed(
+                        response, 'posts/includes/post.html')
+                    self.assertEqual(
+                        response['X-Next-Cursor'],
+                        response.context['page_obj'].next_cursor)
+                    self.assertIn('X-Fragment', response['Vary'])
+
+    def test_fragment_cached_apart_from_page(self):
+        url = self.urls[0]
+        page = self.client.get(url)
+        self.client.get(url, HTTP_X_FRAGMENT='1')
+        with self.assertNumQueries(0):
+            fragment = self.client.get(url, HTTP_X_FRAGMENT='1')
+        self.assertNotContains(fragment, '<html')
+        self.assertLess(len(fragment.content), len(page.content))
+        self.assertNotEqual(fragment['ETag'], page['ETag'])
+        self.assertIn('X-Next-Cursor', fragment)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetViewsTest(TestCase):
+    """Страницы укладываются в бюджет запросов и не делают N+1."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='Группа', slug='budget')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(5)
+        ]
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.authors[i % 5], group=cls.group)
+            for i in range(15)
+        )
+        cls.post = Post.objects.filter(author=cls.authors[0]).first()
+
+    def setUp(self):
+        self.client.force_login(self.authors[0])
+
+    def test_views_within_budget(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.authors[0]]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', args=[self.post.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_post_edit_within_budget(self):
+        response = self.client.post(
+            reverse('posts:post_edit', args=[self.post.pk]),
+            {'text': 'Новый текст', 'group': self.group.pk})
+        self.assertEqual(response.status_code, 302)
+
+    def test_post_create_within_budget(self):
+        response = self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Новый пост', 'group': self.group.pk})
+        self.assertEqual(response.status_code, 302)
+
+
+class GroupIndexTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='last', first_name='Последний', last_name='Автор')
+
+    def test_groups_listed_with_stats(self):
+        group = Group.objects.create(title='С постами', slug='busy')
+        Group.objects.create(title='Пустая', slug='empty')
+        Post.objects.create(text='Пост', author=self.author, group=group)
+        response = self.client.get(reverse('posts:group_index'))
+        self.assertTemplateUsed(response, 'posts/groups.html')
+        self.assertEqual(
+            [group.title for group in response.context['groups']],
+            ['Пустая', 'С постами'])
+        self.assertContains(response, 'Последний Автор')
+        self.assertContains(
+            response, reverse('posts:group_list', args=['empty']))
+
+    def test_queries_do_not_grow_with_groups(self):
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('posts:group_index'))
+            return len(queries)
+
+        for i in range(3):
+            group = Group.objects.create(title=f'Группа {i}', slug=f'g{i}')
+            Post.objects.create(text='Пост', author=self.author, group=group)
+        few = count_queries()
+        for i in range(3, 13):
+            group = Group.objects.create(title=f'Группа {i}', slug=f'g{i}')
+            Post.objects.create(text='Пост', author=self.author, group=group)
+        self.assertEqual(count_queries(), few)
+
+
+class ExportViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='export')
+        Post.objects.create(text='В группе', author=cls.author,
+                            group=cls.group)
+        Post.objects.create(text='Без группы', author=cls.author)
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def export(self, **params):
+        response = self.staff_client.get(reverse('posts:export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_export_only_for_staff(self):
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(reverse('posts:export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_jsonl_with_filter(self):
+        lines = self.export(group='export').decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['group'], 'export')
+
+    def test_export_gzip_csv(self):
+        rows = gzip.decompress(self.export(format='csv', gzip='1'))
+        rows = list(csv.DictReader(rows.decode().splitlines()))
+        self.assertEqual([row['text'] for row in rows],
+                         ['В группе', 'Без группы'])
+        self.assertEqual(rows[0]['author'], 'writer')
+
+    def test_export_bad_date(self):
+        response = self.staff_client.get(
+            reverse('posts:export'), {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
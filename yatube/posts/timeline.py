@@ -0,0 +1,189 @@
+"""Ленты подписок с раскладкой постов при записи (fan-out on write).
+
+Новый пост автора сразу добавляется в таблицу TimelineEntry каждого его
+подписчика, пачками по POSTS_TIMELINE_BATCH_SIZE строк, и лента
+подписок читается одним диапазоном индекса - сколько бы авторов ни было
+в подписках.
+
+Авторы, у которых подписчиков больше POSTS_TIMELINE_FANOUT_LIMIT, по
+лентам не раскладываются (у их подписок pull = True): запись поста не
+должна становиться тем дольше, чем популярнее автор. Их посты
+читаются при показе ленты отдельным запросом и сливаются с основной
+выборкой (гибридная схема fan-out/fan-in).
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils.functional import cached_property
+
+from .models import Follow, Post, TimelineEntry
+from .paginators import CursorPaginator
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    limit = settings.POSTS_TIMELINE_FANOUT_LIMIT
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id, pull=False,
+    ).values_list('user_id', flat=True)[:limit + 1])
+    if len(followers) > limit:
+        # Автор перерос порог: дальше его посты читаются при показе
+        # ленты. Уже разложенные записи остаются, дубликаты отсеивает
+        # TimelinePaginator.
+        Follow.objects.filter(author_id=post.author_id).update(pull=True)
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, author_id=post.author_id,
+                       post_id=post.pk, pub_date=post.pub_date)
+         for user_id in followers),
+        batch_size=settings.POSTS_TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_after(post_id):
+    """Раскладывает одним запросом все посты с id больше post_id - для
+    массовой загрузки, минующей сигналы."""
+    table = TimelineEntry._meta.db_table
+    posts = Post._meta.db_table
+    follows = Follow._meta.db_table
+    with connection.cursor() as cursor:
+        # Посты, созданные за это время через сайт, уже разложены
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, author_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.author_id, p.id, p.pub_date '
+            f'FROM {posts} p JOIN {follows} f '
+            f'ON f.author_id = p.author_id AND f.pull = %s '
+            f'WHERE p.id > %s AND NOT EXISTS (SELECT 1 FROM {table} t '
+            f'WHERE t.post_id = p.id AND t.user_id = f.user_id)',
+            [False, post_id])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние POSTS_TIMELINE_BACKFILL постов автора."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')[:settings.POSTS_TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, author_id=author_id, post_id=pk,
+                       pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=settings.POSTS_TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def follow(user, author):
+    """Подписывает user на author; False - подписка уже была."""
+    with transaction.atomic():
+        # У подписчиков одного автора флаг pull одинаков
+        pull = Follow.objects.filter(author=author, pull=True).exists()
+        _, created = Follow.objects.get_or_create(
+            user=user, author=author, defaults={'pull': pull})
+        if created and not pull:
+            backfill(user.pk, author.pk)
+    return created
+
+
+def unfollow(user, author):
+    """Отменяет подписку и убирает посты автора из ленты user."""
+    with transaction.atomic():
+        Follow.objects.filter(user=user, author=author).delete()
+        TimelineEntry.objects.filter(user=user, author=author).delete()
+
+
+def pulled_authors(user):
+    """Авторы из подписок user, чьи посты читаются при показе ленты."""
+    return list(Follow.objects.filter(user=user, pull=True).values_list(
+        'author_id', flat=True))
+
+
+def rebuild_timelines(users=None):
+    """Пересчитывает флаги pull и заново заполняет ленты подписок.
+
+    users - пользователи, чьи ленты пересобираются (по умолчанию все).
+    Возвращает число записей в пересобранных лентах.
+    """
+    limit = settings.POSTS_TIMELINE_FANOUT_LIMIT
+    follows = Follow.objects.all()
+    timeline = TimelineEntry.objects.all()
+    if users is not None:
+        follows = follows.filter(user__in=users)
+        timeline = timeline.filter(user__in=users)
+    with transaction.atomic():
+        popular = list(Follow.objects.order_by().values('author').annotate(
+            followers=Count('pk')).filter(
+            followers__gt=limit).values_list('author', flat=True))
+        Follow.objects.filter(author__in=popular).update(pull=True)
+        Follow.objects.exclude(author__in=popular).update(pull=False)
+        timeline.delete()
+        for user_id, author_id in follows.filter(pull=False).values_list(
+                'user_id', 'author_id').iterator():
+            backfill(user_id, author_id)
+    return timeline.count()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорные страницы ленты подписок.
+
+    Основная выборка - записи TimelineEntry пользователя по индексу
+    (user, -pub_date, -post); для авторов с pull = True добавляется
+    выборка их постов с той же границей курсора. Посты каждого такого
+    автора ограничены per_page + 1 строками отдельным подзапросом по
+    индексу (author, -pub_date): общий ORDER BY по всем авторам
+    отсортировал бы все их посты. Страница читается за
+    O(per_page * число авторов с pull) строк, а слияние и обрезка до
+    per_page + 1 - в page_queryset.
+    """
+    ordering = ('-pub_date', '-post_id')
+    key_field = 'post_id'
+
+    def __init__(self, user, per_page, pulled=()):
+        super().__init__(
+            TimelineEntry.objects.filter(user=user).select_related(
+                'post__author', 'post__group'),
+            per_page)
+        self.pulled_authors = list(pulled)
+
+    def entries_queryset(self, after=None, before=None):
+        """Записи TimelineEntry одной страницы."""
+        return super().page_queryset(after=after, before=before)
+
+    def pulled_queryset(self, after=None, before=None):
+        """Посты авторов с pull = True: до per_page + 1 на автора, без
+        общего порядка."""
+        in_page = Q()
+        for author_id in self.pulled_authors:
+            posts = CursorPaginator(
+                Post.objects.filter(author_id=author_id), self.per_page)
+            in_page |= Q(pk__in=posts.page_queryset(
+                after=after, before=before).values('pk'))
+        return Post.objects.select_related('author', 'group').filter(
+            in_page).order_by()
+
+    def page_queryset(self, after=None, before=None):
+        posts = {entry.post_id: entry.post
+                 for entry in self.entries_queryset(after, before)}
+        if not self.pulled_authors:
+            return list(posts.values())
+        for post in self.pulled_queryset(after=after, before=before):
+            posts.setdefault(post.pk, post)
+        # ?before= читает ленту в обратном порядке
+        return sorted(posts.values(),
+                      key=lambda post: (post.pub_date, post.pk),
+                      reverse=before is None)[:self.per_page + 1]
+
+    def all_posts(self):
+        """Все посты ленты одним запросом - для count и номеров страниц:
+        записи ленты и посты авторов с pull = True без повторов."""
+        in_timeline = Q(pk__in=self.object_list.values('post_id'))
+        if self.pulled_authors:
+            in_timeline |= Q(author_id__in=self.pulled_authors)
+        return Post.objects.filter(in_timeline)
+
+    @cached_property
+    def count(self):
+        return self.all_posts().count()
+
+    def count_newer(self, pub_date, pk):
+        return CursorPaginator(self.all_posts(), self.per_page).count_newer(
+            pub_date, pk)
@@ -1,13 +1,38 @@
 from django.urls import path
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('groups/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('follow/', views.follow_index, name='follow_index'),
+    path('profile/<str:username>/follow/', views.profile_follow,
+         name='profile_follow'),
+    path('profile/<str:username>/unfollow/', views.profile_unfollow,
+         name='profile_unfollow'),
+    path('search/', views.search, name='search'),
+    path('export/', views.export_posts, name='export'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('rss/', feeds.index_feed, {'feed_type': 'rss'}, name='index_rss'),
+    path('atom/', feeds.index_feed, {'feed_type': 'atom'},
+         name='index_atom'),
+    path('group/<slug:slug>/rss/', feeds.group_feed, {'feed_type': 'rss'},
+         name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.group_feed, {'feed_type': 'atom'},
+         name='group_atom'),
+    path('profile/<str:username>/rss/', feeds.profile_feed,
+         {'feed_type': 'rss'}, name='profile_rss'),
+    path('profile/<str:username>/atom/', feeds.profile_feed,
+         {'feed_type': 'atom'}, name='profile_atom'),
+    path('api/posts/', api.post_list, name='api_posts'),
+    path('api/groups/<slug:slug>/posts/', api.group_posts,
+         name='api_group_posts'),
+    path('api/profiles/<str:username>/posts/', api.profile_posts,
+         name='api_profile_posts'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post'),
 ]
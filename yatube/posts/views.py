@@ -1,59 +1,211 @@
+from urllib.parse import urlencode
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_POST
+from core.query_budget import query_budget
+from core.replicas import replica_reads
+from .cache import (GLOBAL_SCOPE, author_scope, conditional_feed,
+                    conditional_post, group_scope, is_fragment)
+from .export import FORMATS, export_rows, export_stream, parse_moment
+from .models import Follow, Group, Post, User
 from .forms import PostForm
+from .lookups import get_author_or_404, get_group_or_404
+from .paginators import CursorPaginator, ElidedPaginator
+from .search import highlight, search_posts
+from .timeline import TimelinePaginator, follow, pulled_authors, unfollow
+
 
+def paging(request, post_list, count_last_publ: int = 10,
+           keyset: bool = True):
+    """Страница ленты.
 
-def paging(request, post_list, count_last_publ: int = 10):
-    paginator = Paginator(post_list, count_last_publ)
+    По умолчанию лента листается курсорами ?after= / ?before=, номерные
+    страницы (COUNT + OFFSET) отдаются только по явному ?page= или для
+    списков, не упорядоченных по дате (keyset=False).
+    """
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None or not keyset:
+        paginator = ElidedPaginator(post_list, count_last_publ)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(post_list, count_last_publ)
+    return paginator.get_page(after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+
+
+def render_feed(request, template_name, context):
+    """Страница ленты, а в режиме фрагмента - только посты и навигация
+    (posts/includes/feed_fragment.html) для подгрузки без перезагрузки.
+
+    Посты в обоих случаях рисует один шаблон posts/includes/post.html.
+    """
+    if not is_fragment(request):
+        response = render(request, template_name, context)
+    else:
+        response = render(
+            request, 'posts/includes/feed_fragment.html', context)
+        next_cursor = getattr(context['page_obj'], 'next_cursor', None)
+        if next_cursor:
+            response['X-Next-Cursor'] = next_cursor
+    patch_vary_headers(response, ('X-Fragment',))
+    return response
+
+
+def feed_posts(group=None, author=None):
+    """Посты ленты: общей, группы или автора.
+
+    Этими же запросами пользуется команда explain_feeds, проверяющая,
+    что ленты читаются по индексам.
+    """
+    post_list = Post.objects.select_related('author', 'group')
+    if group is not None:
+        post_list = post_list.filter(group=group)
+    if author is not None:
+        post_list = post_list.filter(author=author)
+    return post_list
+
 
+def detail_post_queryset():
+    return Post.objects.select_related('author__post_stats', 'group')
 
+
+@query_budget(4)
+@replica_reads
+@conditional_feed(lambda: GLOBAL_SCOPE, lambda: Post.objects.all())
 def index(request):
     """Главная страница"""
 
-    post_list = Post.objects.all()
+    post_list = feed_posts()
     page_obj = paging(request, post_list)
     template_name = 'posts/index.html'
     context = {
         'page_obj': page_obj,
     }
-    return render(request, template_name, context)
+    return render_feed(request, template_name, context)
 
 
+@query_budget(5)
+@replica_reads
+@conditional_feed(lambda slug: group_scope(slug),
+                  lambda slug: Post.objects.filter(group__slug=slug))
 def group_posts(request, slug):
     """Страница с информацией об одной группе"""
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    group = get_group_or_404(request, slug)
+    post_list = feed_posts(group=group)
     page_obj = paging(request, post_list)
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    return render_feed(request, 'posts/group_list.html', context)
 
 
+@query_budget(5)
+@replica_reads
+@conditional_feed(
+    lambda username: author_scope(username),
+    lambda username: Post.objects.filter(author__username=username))
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    author = get_author_or_404(request, username)
+    post_list = feed_posts(author=author)
     page_obj = paging(request, post_list)
+    following = (request.user.is_authenticated
+                 and request.user != author
+                 and Follow.objects.filter(
+                     user=request.user, author=author).exists())
     context = {
         'page_obj': page_obj,
         'author': author,
+        'following': following,
+    }
+    return render_feed(request, 'posts/profile.html', context)
+
+
+@query_budget(2)
+@replica_reads
+@conditional_feed(lambda: GLOBAL_SCOPE, lambda: Post.objects.all())
+def group_index(request):
+    """Каталог групп: число постов, дата и автор последнего поста.
+
+    Всё берётся из GroupStats одним запросом, сколько бы ни было групп.
+    """
+    groups = (Group.objects.select_related('stats__last_author')
+              .order_by('title'))
+    return render(request, 'posts/groups.html', {'groups': groups})
+
+
+# сессия, пользователь, авторы с pull = True, записи ленты и посты этих
+# авторов; ?before= у начала ленты перечитывает первую страницу
+@query_budget(7)
+@login_required
+def follow_index(request):
+    """Посты авторов, на которых подписан пользователь"""
+    paginator = TimelinePaginator(request.user, 10,
+                                  pulled=pulled_authors(request.user))
+    page_obj = paginator.get_page(after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
+    context = {
+        'page_obj': page_obj,
+    }
+    return render_feed(request, 'posts/follow.html', context)
+
+
+# подписка: автор, проверка флага pull, SELECT и INSERT подписки и
+# последние посты автора в ленту (выборка и вставка)
+@query_budget(8)
+@login_required
+@require_POST
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        follow(request.user, author)
+    return redirect('posts:profile', username=username)
+
+
+@query_budget(7)
+@login_required
+@require_POST
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    unfollow(request.user, author)
+    return redirect('posts:profile', username=username)
+
+
+@query_budget(4)
+@replica_reads
+def search(request):
+    """Полнотекстовый поиск по постам"""
+    query = request.GET.get('q', '').strip()
+    page_obj = paging(request, search_posts(query), keyset=False)
+    for post in page_obj:
+        post.snippet_html = highlight(post.snippet)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'extra_query': urlencode({'q': query}),
     }
-    return render(request, 'posts/profile.html', context)
+    return render_feed(request, 'posts/search.html', context)
 
 
+@query_budget(4)
+@replica_reads
+@conditional_post
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(detail_post_queryset(), pk=post_id)
     context = {
         'post': post,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+# сессия, пользователь, проверка группы (2), INSERT, до двух запросов
+# на каждый из двух счётчиков постов, два - на поисковый индекс и
+# подписчики автора с вставкой в их ленты (не больше
+# POSTS_TIMELINE_FANOUT_LIMIT / POSTS_TIMELINE_BATCH_SIZE пачек)
+@query_budget(14)
 @login_required
 def post_create(request):
     if request.method == 'POST':
@@ -70,10 +222,13 @@ def post_create(request):
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+# с изменённым текстом - ещё два запроса на поисковый индекс, при переносе
+# в другую группу - slug прежней группы и два обновления счётчиков групп
+@query_budget(11)
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post_id)
     form = PostForm(request.POST or None, instance=post)
     if form.is_valid():
@@ -85,3 +240,33 @@ def post_edit(request, post_id):
         'post_id': post_id
     }
     return render(request, 'posts/create_post.html', context)
+
+
+# Сами посты читаются уже при отдаче ответа, вне подсчёта бюджета
+@query_budget(2)
+@staff_member_required
+def export_posts(request):
+    """Потоковая выгрузка постов для аналитики"""
+    data_format = request.GET.get('format', 'jsonl')
+    if data_format not in FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат')
+    filters = {
+        'group': request.GET.get('group'),
+        'author': request.GET.get('author'),
+    }
+    for name, end_of_day in (('since', False), ('until', True)):
+        if request.GET.get(name):
+            filters[name] = parse_moment(request.GET[name], end_of_day)
+            if filters[name] is None:
+                return HttpResponseBadRequest(f'Некорректная дата {name}')
+    compress = request.GET.get('gzip') == '1'
+    filename = f'posts.{data_format}'
+    content_type = 'text/csv' if data_format == 'csv' else 'application/jsonl'
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(
+        export_stream(export_rows(**filters), data_format, compress),
+        content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,40 @@
+// Подгрузка следующей страницы ленты без перезагрузки: вместо перехода
+// по ссылке «Следующая» запрашивается фрагмент ленты (заголовок
+// X-Fragment), его посты дописываются в список, а навигация заменяется.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('a[data-feed-next]');
+  var list = document.querySelector('.post-list');
+  if (!link || !list) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.href, {headers: {'X-Fragment': '1'}})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      var fragment = document.createElement('div');
+      fragment.innerHTML = html;
+      var posts = fragment.querySelector('.post-list');
+      if (posts.children.length) {
+        list.appendChild(document.createElement('hr'));
+      }
+      while (posts.firstChild) {
+        list.appendChild(posts.firstChild);
+      }
+      var nav = link.closest('nav');
+      var nextNav = fragment.querySelector('nav');
+      if (nextNav) {
+        nav.replaceWith(nextNav);
+      } else {
+        nav.remove();
+      }
+    })
+    .catch(function () {
+      // Без фрагмента - обычный переход на следующую страницу
+      window.location = link.href;
+    });
+});
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_KEY = 'users:user:{pk}'
+
+
+def forget_user(pk):
+    cache.delete(USER_KEY.format(pk=pk))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кэша.
+
+    AuthenticationMiddleware загружает пользователя на каждый запрос;
+    из кэша он берётся без запроса к базе. Запись хранится по id
+    пользователя, а не по ключу сессии: смена пароля или выход сбрасывают
+    её сразу для всех сессий (users.signals), а хэш пароля в проверке
+    сессии сравнивается уже со свежими данными.
+    """
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(pk=user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
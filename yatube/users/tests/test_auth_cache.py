@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..backends import USER_KEY
+
+User = get_user_model()
+
+
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', password='old-password-123')
+        self.client.force_login(self.user)
+
+    def test_warm_request_without_auth_queries(self):
+        url = reverse('about:author')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Пользователь: reader')
+
+    def test_password_change_logs_out_other_sessions(self):
+        other = Client()
+        other.force_login(self.user)
+        other.get(reverse('about:author'))
+        response = self.client.post(reverse('users:password_change'), {
+            'old_password': 'old-password-123',
+            'new_password1': 'new-password-456',
+            'new_password2': 'new-password-456',
+        })
+        self.assertRedirects(response, reverse('users:password_change_done'))
+        # Сменивший пароль остаётся в системе, другие сессии - нет
+        self.assertTrue(self.client.get(
+            reverse('about:author')).context['user'].is_authenticated)
+        self.assertFalse(other.get(
+            reverse('about:author')).context['user'].is_authenticated)
+
+    def test_logout_forgets_user(self):
+        self.client.get(reverse('about:author'))
+        self.assertIsNotNone(cache.get(USER_KEY.format(pk=self.user.pk)))
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(USER_KEY.format(pk=self.user.pk)))
@@ -49,16 +49,62 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Журнал медленных запросов сохраняет записи после всех остальных
+    'core.slow_queries.SlowQueryMiddleware',
+    # Раньше остальных, чтобы общее время включало их работу
+    'core.profiling.ProfilingMiddleware',
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Замечает запись в базу и на время привязывает клиента к основной
+    # базе; после сессий - их сохранение записью не считается
+    'core.replicas.ReplicaMiddleware',
+    # Транзакции GET-запросов не берут блокировку записи SQLite заранее;
+    # после сессий - их сохранение пишет в базу
+    'core.db.middleware.DeferredReadsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    # После AuthenticationMiddleware: гостям страницы отдаются из кэша
+    'posts.cache.PageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
+
+# Превышение бюджета запросов view (core.query_budget): False - запись
+# в лог, True - исключение QueryBudgetExceeded (включается в тестах)
+QUERY_BUDGET_STRICT = False
+
+# Запросы к базе дольше стольких миллисекунд попадают в журнал
+# медленных запросов (core.slow_queries, раздел админки); None - выключено
+SLOW_QUERY_THRESHOLD_MS = 200
+# Сколько последних медленных запросов хранить
+SLOW_QUERY_LOG_SIZE = 500
+
+# Доля запросов, которые профилирует core.profiling (0 - выключено, 1 - все).
+# По умолчанию выключено: профиль добавляет обёртки и строки в лог, что
+# искажает замеры benchmarks и вывод тестов.
+PROFILING_SAMPLE_RATE = float(
+    os.environ.get('YATUBE_PROFILING_SAMPLE_RATE', 0))
+# Заголовок Server-Timing (время в базе, число запросов) получают только
+# сотрудники (is_staff); True - все клиенты
+PROFILING_SERVER_TIMING_PUBLIC = False
+# Каталог, через который воркеры gunicorn объединяют метрики для /metrics;
+# без него /metrics показывает только метрики своего процесса
+METRICS_DIR = os.environ.get('YATUBE_METRICS_DIR')
+# Как часто (в секундах) процесс сбрасывает свои метрики в METRICS_DIR
+METRICS_FLUSH_INTERVAL = 1
+# Адреса, с которых /metrics доступен без входа (Prometheus); остальным -
+# только сотрудникам. За прокси здесь должен быть адрес прокси.
+METRICS_ALLOWED_IPS = os.environ.get(
+    'YATUBE_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# Шаблоны, время которых выводится в Server-Timing отдельной метрикой
+PROFILING_TEMPLATE_METRICS = {
+    'posts/includes/paginator.html': 'paginator',
+}
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
@@ -84,10 +130,104 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite с PRAGMA из SQLITE_PRAGMAS (core.db.sqlite3)
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение переиспользуется запросами потока, а не открывается
+        # заново на каждый
+        'CONN_MAX_AGE': 60,
     }
 }
+# PRAGMA для каждого нового соединения с SQLite
+SQLITE_PRAGMAS = {
+    # Журнал WAL: чтения не ждут записи, а запись - чтений
+    'journal_mode': 'wal',
+    # С WAL при NORMAL база не портится при сбое; fsync только на
+    # контрольных точках
+    'synchronous': 'normal',
+    # Кэш страниц на соединение: отрицательное значение - в КиБ (64 МБ)
+    'cache_size': -64000,
+    # Чтение файла базы через mmap, до 256 МБ
+    'mmap_size': 256 * 1024 * 1024,
+    # Сколько миллисекунд ждать блокировку, прежде чем ответить
+    # "database is locked"
+    'busy_timeout': 5000,
+}
+# Как начинаются транзакции основной базы: IMMEDIATE сразу берёт
+# блокировку записи, DEFERRED (как в Django по умолчанию) - при первой
+# записи. Реплики, GET-запросы и блоки core.db.sqlite3.base.deferred() -
+# всегда DEFERRED
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE'
+
+# Реплики только для чтения (core.replicas): ленты и страницы постов
+# читают Post/Group/User из них. Локально это копии db.sqlite3, которые
+# обновляет команда replicate_db:
+#     YATUBE_DB_REPLICAS=replica1.sqlite3,replica2.sqlite3
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'core.db.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name.strip()),
+        'CONN_MAX_AGE': 60,
+        # В тестах реплика - та же тестовая база
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Сколько секунд после записи клиент читает только из основной базы
+REPLICA_STICKY_SECONDS = 10
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# Кэш лент работает и с файловым кэшем, общим для нескольких процессов:
+# 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+# 'LOCATION': os.path.join(BASE_DIR, 'cache'),
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Сколько секунд страница для гостей (posts.cache.PageCacheMiddleware)
+# считается свежей; при записи постов она устаревает раньше.
+POSTS_PAGE_CACHE_TIMEOUT = 60 * 15
+# Сколько ещё хранить устаревшую копию, чтобы отдавать её, пока один
+# запрос пересобирает страницу
+POSTS_PAGE_CACHE_STALE_TIMEOUT = 60 * 60
+# Через сколько секунд снимается блокировка пересборки, если запрос,
+# взявший её, так и не сохранил страницу
+POSTS_PAGE_CACHE_LOCK_TIMEOUT = 30
+# Сколько секунд хранятся версии лент и время их изменения. Ключи
+# заводятся и для адресов несуществующих групп и авторов, поэтому не
+# должны жить вечно; истёкшая версия заводится заново - страницы ленты
+# просто пересобираются.
+POSTS_FEED_VERSION_TIMEOUT = 60 * 60 * 24
+# Ленты подписок (posts.timeline): авторы, у которых подписчиков больше
+# FANOUT_LIMIT, не раскладываются по лентам при записи поста, а читаются
+# при показе; записи вставляются пачками по BATCH_SIZE; при подписке в
+# ленту добавляются BACKFILL последних постов автора
+POSTS_TIMELINE_FANOUT_LIMIT = 1000
+POSTS_TIMELINE_BATCH_SIZE = 500
+POSTS_TIMELINE_BACKFILL = 200
+# Кэш групп по slug и авторов по username в памяти процесса
+# (posts.lookups): сколько записей и сколько секунд хранить
+POSTS_LOOKUP_CACHE_SIZE = 1024
+POSTS_LOOKUP_CACHE_TTL = 60
+
+# Сессии читаются из кэша, а в базу только записываются
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = [
+    # Пользователь сессии берётся из кэша (users.backends)
+    'users.backends.CachedModelBackend',
+    # Для сессий, открытых до появления кэша
+    'django.contrib.auth.backends.ModelBackend',
+]
+# Сколько секунд пользователь сессии хранится в кэше; смена пароля,
+# выход и любое сохранение пользователя сбрасывают запись сразу
+AUTH_USER_CACHE_TIMEOUT = 60
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -135,3 +275,24 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# Logging
+# https://docs.djangoproject.com/en/2.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # Строки JSON с профилем запросов
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}